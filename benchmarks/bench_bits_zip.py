@@ -0,0 +1,62 @@
+"""
+Compares create_bits_zip throughput serially and on thread and process pools, over a synthetic application tree.
+
+    python benchmarks/bench_bits_zip.py [files] [workers]
+"""
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from cloudfoundry.utils import create_bits_zip
+
+
+def build_tree(root, files):
+    words = ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'eta', 'theta']
+    for n in range(files):
+        directory = os.path.join(root, 'pkg{}'.format(n % 50))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        size = 2 ** (10 + n % 8)
+        body = ' '.join(words[(n + i) % len(words)] for i in range(size // 6))
+        with open(os.path.join(directory, 'file{}.txt'.format(n)), 'w') as fp:
+            fp.write(body + os.urandom(size // 4).encode('hex'))
+
+
+def measure(path, total_bytes, **kwargs):
+    start = time.time()
+    archive = create_bits_zip(path, **kwargs)
+    elapsed = time.time() - start
+    digest = hashlib.sha1(archive.read()).hexdigest()
+    archive.close()
+    return elapsed, total_bytes / elapsed / 1024 / 1024, digest
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    root = tempfile.mkdtemp()
+    try:
+        build_tree(root, files)
+        total_bytes = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(root) for f in fs)
+        print("{} files, {:.1f} MB".format(files, total_bytes / 1024.0 / 1024))
+        runs = [
+            ('serial', {}),
+            ('{} threads'.format(workers), {'workers': workers}),
+            ('{} processes'.format(workers), {'workers': workers, 'use_processes': True}),
+        ]
+        digests = set()
+        for label, kwargs in runs:
+            elapsed, throughput, digest = measure(root, total_bytes, **kwargs)
+            digests.add(digest)
+            print("{:>14}: {:6.2f}s {:7.1f} MB/s".format(label, elapsed, throughput))
+        print("byte-identical archives: {}".format(len(digests) == 1))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Estimates the per-object memory of CloudFoundryApp and CloudFoundryRoute against the previous __dict__ based
+representation, for objects built from decoded JSON the way a refresh builds them.
+
+    python benchmarks/bench_model_memory.py [count]
+"""
+import json
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from cloudfoundry.apps import CloudFoundryApp
+from cloudfoundry.routes import CloudFoundryRoute
+
+
+class DictModel(object):
+    """
+    The previous layout: every field, URLs included, stored in the instance __dict__
+    """
+
+    def __init__(self, metadata, entity):
+        for key, value in entity.items():
+            setattr(self, key, value)
+        self.guid = metadata['guid']
+        self.url = metadata['url']
+
+
+def app_resource(space_guids, stack_guid):
+    guid = str(uuid.uuid4())
+    space_guid = space_guids[hash(guid) % len(space_guids)]
+    return {
+        'metadata': {'guid': guid, 'url': '/v2/apps/' + guid},
+        'entity': {
+            'name': 'app-' + guid[:8], 'production': False, 'space_guid': space_guid, 'stack_guid': stack_guid,
+            'buildpack': 'java_buildpack', 'detected_buildpack': 'java-main java-opts open-jdk-like-jre',
+            'environment_json': {}, 'memory': 1024, 'instances': 2, 'disk_quota': 1024, 'state': 'STARTED',
+            'version': str(uuid.uuid4()), 'command': None, 'console': False, 'debug': None,
+            'staging_task_id': str(uuid.uuid4()), 'package_state': 'STAGED', 'health_check_timeout': None,
+            'staging_failed_reason': None, 'docker_image': None, 'package_updated_at': '2015-03-01T10:00:00Z',
+            'detected_start_command': 'java -jar app.jar', 'space_url': '/v2/spaces/' + space_guid,
+            'stack_url': '/v2/stacks/' + stack_guid, 'events_url': '/v2/apps/{}/events'.format(guid),
+            'service_bindings_url': '/v2/apps/{}/service_bindings'.format(guid),
+            'routes_url': '/v2/apps/{}/routes'.format(guid),
+        },
+    }
+
+
+def route_resource(space_guids, domain_guid):
+    guid = str(uuid.uuid4())
+    space_guid = space_guids[hash(guid) % len(space_guids)]
+    return {
+        'metadata': {'guid': guid, 'url': '/v2/routes/' + guid},
+        'entity': {
+            'host': 'host-' + guid[:8], 'domain_guid': domain_guid, 'space_guid': space_guid,
+            'domain_url': '/v2/domains/' + domain_guid, 'space_url': '/v2/spaces/' + space_guid,
+            'apps_url': '/v2/routes/{}/apps'.format(guid),
+        },
+    }
+
+
+def deep_size(objects):
+    """
+    Bytes reachable from ``objects``, counting shared objects (interned strings, small ints...) once
+    """
+    seen = set()
+    total = 0
+    pending = list(objects)
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            pending.extend(obj)
+        elif hasattr(obj, '__dict__'):
+            pending.append(obj.__dict__)
+        elif hasattr(obj, '__slots__'):
+            for klass in type(obj).__mro__:
+                for slot in getattr(klass, '__slots__', ()):
+                    if hasattr(obj, slot):
+                        pending.append(getattr(obj, slot))
+    return total
+
+
+def compare(label, model, resources):
+    # Decode from JSON, as a refresh does, so every object starts with its own copy of each string
+    resources = json.loads(json.dumps(resources))
+    compact = [model.from_dict(r['metadata'], r['entity']) for r in resources]
+    resources = json.loads(json.dumps(resources))
+    legacy = [DictModel(r['metadata'], r['entity']) for r in resources]
+    # Strings shared through the intern table count once, like anything else reachable from several objects
+    compact_size = deep_size(compact) / float(len(compact))
+    legacy_size = deep_size(legacy) / float(len(legacy))
+    print("{:>6}: {:7.0f} bytes/object before, {:7.0f} after ({:.0%} saved)".format(
+        label, legacy_size, compact_size, 1 - compact_size / legacy_size))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    space_guids = [str(uuid.uuid4()) for _ in range(200)]
+    stack_guid = str(uuid.uuid4())
+    domain_guids = [str(uuid.uuid4()) for _ in range(5)]
+    compare('apps', CloudFoundryApp, [app_resource(space_guids, stack_guid) for _ in range(count)])
+    compare('routes', CloudFoundryRoute, [route_resource(space_guids, domain_guids[n % len(domain_guids)])
+                                          for n in range(count)])
+
+
+if __name__ == '__main__':
+    main()
@@ -1,115 +1,442 @@
 import json
 from urlparse import urljoin
 import requests
+from cloudfoundry.exceptions import CloudFoundryException, CloudFoundryNotFoundException, \
+    CloudFoundryAuthenticationException, CloudFoundryUnavailableException
 from cloudfoundry.apps import CloudFoundryApp
 from cloudfoundry.organizations import CloudFoundryOrg
 from cloudfoundry.spaces import CloudFoundrySpace
 from cloudfoundry.routes import CloudFoundryRoute
 from cloudfoundry.domains import CloudFoundryDomain
-from utils import create_bits_zip
-from collections import OrderedDict
+from cloudfoundry.paging import Paginator, DEFAULT_MAX_WORKERS, DEFAULT_RESULTS_PER_PAGE
+from cloudfoundry.indexes import APP_INDEXES, ROUTE_INDEXES, NAME_INDEXES
+from cloudfoundry.resources import ResourceCollection, build_model
+from cloudfoundry.query import query_url
+from cloudfoundry.cache import ResourceCache, DEFAULT_TTL
+from cloudfoundry.sync import HighWaterMark, DELETE_EVENTS, DEFAULT_FULL_RESYNC_INTERVAL
+from cloudfoundry.bulk import run_bulk, DEFAULT_BULK_CONCURRENCY
+from cloudfoundry.relations import TO_ONE, TO_MANY, batches
+from cloudfoundry.snapshot import DEFAULT_MAX_STALENESS
+from cloudfoundry.auth import Token, DEFAULT_TOKEN_CACHE, REFRESH_MARGIN, redact
+from cloudfoundry.transport import Transport, DEFAULT_POOL_MAXSIZE, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+from cloudfoundry.retry import RetryPolicy, RETRY_STATUSES
+from cloudfoundry.metrics import RequestEvent, CacheEvent, RefreshEvent, url_template, notify
+from cloudfoundry.polling import default_poller, DEFAULT_WAIT_TIMEOUT
+from cloudfoundry.inventory import Inventory, export_csv, export_jsonl
+from cloudfoundry.watch import Watcher, Watch, WATCH_EVENTS, DEFAULT_WATCH_INTERVAL
+from cloudfoundry.singleflight import SingleFlight
+from cloudfoundry.httpcache import ResponseCache, DEFAULT_RESPONSE_CACHE_BYTES
+from utils import create_bits_zip, iter_bits, file_mode, MultipartBody, FingerprintCache, \
+    DEFAULT_COMPRESSLEVEL, DEFAULT_SPILL_THRESHOLD, RESOURCE_MATCH_MIN_SIZE
+import os
+import itertools
 import logging
+import threading
 import time
-from memoize import Memoizer
 
 
-cache_store = {}
-memo = Memoizer(cache_store)
-max_cache_time = 10
+RESOURCE_TYPES = {
+    'apps': (('v2/apps',), CloudFoundryApp),
+    'orgs': (('v2/organizations',), CloudFoundryOrg),
+    'spaces': (('v2/spaces',), CloudFoundrySpace),
+    'routes': (('v2/routes',), CloudFoundryRoute),
+    'domains': (('v2/shared_domains', 'v2/private_domains'), CloudFoundryDomain),
+}
 
-
-class CloudFoundryException(Exception):
-    pass
-
-
-class CloudFoundryAuthenticationException(CloudFoundryException):
-    pass
+COLLECTION_INDEXES = {
+    'apps': APP_INDEXES,
+    'orgs': NAME_INDEXES,
+    'spaces': NAME_INDEXES,
+    'routes': ROUTE_INDEXES,
+    'domains': NAME_INDEXES,
+}
 
 
 class CloudFoundryInterface(object):
-
-    def __init__(self, target, username=None, password=None, debug=False, verify=True):
+    """
+    Client for the CF v2 API.  Once logged in, one interface can be shared by any number of threads:
+
+    * Collections (``apps``, ``spaces``...) are replaced as a whole when refreshed or synced, so a collection a thread
+      already holds stays consistent; only single-resource changes made through the interface patch it in place.
+    * Collections can be read while they are being patched, and iterating one never fails on concurrent changes.
+    * The access token is swapped as a whole and renewed by one thread at a time; the connection pool is never
+      replaced.
+    * Cache statistics are not locked and may undercount under contention.
+
+    Models are plain objects: share them freely for reading, but do not change them from several threads.
+    """
+
+    def __init__(self, target, username=None, password=None, debug=False, verify=True,
+                 max_workers=DEFAULT_MAX_WORKERS, results_per_page=DEFAULT_RESULTS_PER_PAGE,
+                 cache_ttls=None, cache_ttl=DEFAULT_TTL, cache_backend=None, incremental=False,
+                 fingerprint_cache=None, snapshot_store=None, max_staleness=DEFAULT_MAX_STALENESS,
+                 token_cache=DEFAULT_TOKEN_CACHE, transport=None, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT, keep_alive=True, gzip=True,
+                 retry_policy=None, rate_limiter=None, hooks=None, watch_interval=DEFAULT_WATCH_INTERVAL,
+                 stale_while_revalidate=False, response_cache_bytes=DEFAULT_RESPONSE_CACHE_BYTES,
+                 full_resync_interval=DEFAULT_FULL_RESYNC_INTERVAL):
+        """
+        :param target: The CF API endpoint (e.g. https://api.run.pivotal.io)
+        :type target: str
+        :param max_workers: Upper bound on pages fetched concurrently when listing a collection
+        :type max_workers: int
+        :param results_per_page: Page size for collection listings
+        :type results_per_page: int
+        :param cache_ttls: Per resource type cache lifetime in seconds (apps, orgs, spaces, routes, domains)
+        :type cache_ttls: dict
+        :param cache_ttl: Cache lifetime for resource types missing from ``cache_ttls``
+        :type cache_ttl: int
+        :param cache_backend: Storage for cached collections, defaults to a private in-memory LRU store.  Pass one
+            shared backend to several interfaces to let them reuse each other's fetches.  Backends must keep the live
+            collections in memory (see CacheBackend).
+        :type cache_backend: cloudfoundry.cache.CacheBackend
+        :param incremental: Once apps and routes have been fetched in full, refresh them by asking only for what
+            changed since the last fetch (and for delete events) instead of listing everything again
+        :type incremental: bool
+        :param full_resync_interval: Seconds after which incrementally synced collections are listed in full again,
+            dropping resources deleted without a delete event (e.g. routes of a deleted space)
+        :type full_resync_interval: float
+        :param fingerprint_cache: Where upload_bits keeps file digests; pass a FingerprintCache with a path to reuse
+            them across runs
+        :type fingerprint_cache: cloudfoundry.utils.FingerprintCache
+        :param snapshot_store: Where fetched collections are persisted, so that a new interface starts from the last
+            fetch rather than downloading everything
+        :type snapshot_store: cloudfoundry.snapshot.SnapshotStore
+        :param max_staleness: Age in seconds up to which a snapshot older than the cache TTL is still served, while
+            it is refreshed on a background thread
+        :type max_staleness: int
+        :param token_cache: Where tokens and authorization endpoints are kept.  By default one cache is shared by the
+            whole process, so interfaces for the same target and user reuse a single login.
+        :type token_cache: cloudfoundry.auth.TokenCache
+        :param transport: The pooled connection to send every request through.  Defaults to a private one built from
+            the settings below; pass ``cloudfoundry.transport.shared_transport(target)`` to share connections with
+            other interfaces for the same API.
+        :type transport: cloudfoundry.transport.Transport
+        :param pool_maxsize: Connections kept open per host
+        :type pool_maxsize: int
+        :param connect_timeout: Seconds to wait for a connection
+        :type connect_timeout: float
+        :param read_timeout: Seconds to wait for the server between bytes of a response
+        :type read_timeout: float
+        :param keep_alive: Reuse connections across requests
+        :type keep_alive: bool
+        :param gzip: Ask for compressed responses
+        :type gzip: bool
+        :param retry_policy: How rate-limited (429), unavailable (502-504) and failed requests are retried, defaults
+            to RetryPolicy(); pass RetryPolicy(max_retries=0) to fail straight away
+        :type retry_policy: cloudfoundry.retry.RetryPolicy
+        :param rate_limiter: Client-side limiter every API request waits on, e.g. a TokenBucket shared by the
+            interfaces of a bulk tool
+        :type rate_limiter: cloudfoundry.retry.TokenBucket
+        :param hooks: Instrumentation hooks notified of every request, cache lookup and collection refresh (e.g. a
+            cloudfoundry.metrics.HistogramCollector)
+        :type hooks: list
+        :param watch_interval: Seconds between polls for changes while there are watches (see ``watch``)
+        :type watch_interval: float
+        :param stale_while_revalidate: Once a collection has expired, keep returning it while a background thread
+            refreshes it, rather than making readers wait for the refresh
+        :type stale_while_revalidate: bool
+        :param response_cache_bytes: Memory for GET responses remembered by URL, so they can be revalidated with
+            ``ETag`` and ``Last-Modified`` and an unchanged body is not decoded again; 0 to disable.  Size it to hold
+            the listings of the collections in use, or every refresh pushes out the pages the next one needs.
+        :type response_cache_bytes: int
+        """
         self._apps = None
         self._orgs = None
         self._spaces = None
         self._routes = None
         self._domains = None
-        self._expires_at = None
+        self._incremental = incremental
+        self._high_water = HighWaterMark()
+        self._full_resync_interval = full_resync_interval
+        # When each collection was last listed in full
+        self._listed_at = {}
+        # Guards patches and replacements of the cached collections, which worker threads make concurrently
+        self._patch_lock = threading.RLock()
+        self._fingerprints = fingerprint_cache if fingerprint_cache is not None else FingerprintCache()
+        self._snapshots = snapshot_store
+        self._max_staleness = max_staleness
+        # Resource types whose snapshot was already considered, those whose snapshot matches the collection in
+        # memory, those being refreshed in the background, and when each collection was last fetched
+        self._snapshots_loaded = set()
+        self._snapshots_saved = set()
+        self._revalidating = set()
+        self._fetched_at = {}
+        # Snapshots waiting for the background writer, and a counter per resource type bumped whenever the
+        # collection in memory stops matching its snapshot
+        self._pending_saves = set()
+        self._snapshot_writer = False
+        self._snapshot_versions = {}
 
         self._target = target
         self._username = username
         self._password = password
         self._verify = verify
-        self._token = None
+        # The current cloudfoundry.auth.Token, replaced as a whole so readers never mix two tokens' fields
+        self._credentials = None
         self._auth_endpoint = None
+        self._tokens = token_cache
 
         self._debug = debug
 
-        self._session = None
+        if transport is None:
+            transport = Transport(pool_maxsize=pool_maxsize, connect_timeout=connect_timeout,
+                                  read_timeout=read_timeout, keep_alive=keep_alive, gzip=gzip)
+        self._transport = transport
+        self._retry = retry_policy if retry_policy is not None else RetryPolicy()
+        self._limiter = rate_limiter
+        self._hooks = list(hooks or [])
+        self._watcher = Watcher(self, watch_interval)
+        self._stale_while_revalidate = stale_while_revalidate
+        # Concurrent refreshes of a collection, and identical concurrent GETs, share one request
+        self._flights = SingleFlight()
+        self._responses = ResponseCache(response_cache_bytes)
+        self._paginator = Paginator(self._get_page, max_workers=max_workers, results_per_page=results_per_page)
+        self._cache = ResourceCache(u"{}|{}".format(target, username), ttls=cache_ttls, default_ttl=cache_ttl,
+                                    backend=cache_backend)
 
     def login(self):
-        logging.info("Logging in to CF API {}".format(self._target))
+        """
+        Obtains an access token, reusing a cached one for the same target, user and password when it is still
+        valid.  Tokens are then renewed automatically shortly before they expire.
 
-        auth_endpoint = requests.get("{}/{}".format(self._target, "v2/info"),
-                                     verify=self._verify).json()['authorization_endpoint']
+        :return: The access token
+        :rtype: str
+        """
+        logging.info("Logging in to CF API {}".format(self._target))
+        with self._tokens.lock(self._target, self._username):
+            token = self._tokens.get(self._target, self._username, self._password)
+            if token is None or token.expires_within(REFRESH_MARGIN):
+                token = self._password_grant()
+            self._use_token(token)
+
+        return token.access_token
+
+    def _authorization_endpoint(self):
+        if self._auth_endpoint is None:
+            self._auth_endpoint = self._tokens.endpoint(self._target)
+        if self._auth_endpoint is None:
+            self._auth_endpoint = self._transport.request('GET', "{}/{}".format(self._target, "v2/info"),
+                                                          verify=self._verify).json()['authorization_endpoint']
+            self._tokens.set_endpoint(self._target, self._auth_endpoint)
+        return self._auth_endpoint
+
+    def _grant(self, login_data):
+        """
+        Runs an OAuth grant against UAA and caches the resulting token
 
+        :rtype: cloudfoundry.auth.Token
+        """
+        headers = {"Authorization": "Basic Y2Y6", "Accept": "application/json"}
+        response = self._transport.request('POST', "{}/{}".format(self._authorization_endpoint(), "oauth/token"),
+                                           data=login_data, headers=headers, verify=self._verify)
+        if response.status_code != 200:
+            raise CloudFoundryAuthenticationException("{} grant failed: HTTP {} - {}".format(
+                login_data['grant_type'], response.status_code, redact(response.text)))
+        response = response.json()
+        token = Token(response['access_token'], response.get('refresh_token', login_data.get('refresh_token')),
+                      int(response['expires_in']) + time.time())
+        self._tokens.set(self._target, self._username, token, self._password)
+        return token
+
+    def _password_grant(self):
         login_data = {
                 "grant_type": "password",
                 "password": self._password,
                 "scope": "",
                 "username": self._username
         }
-        headers = {"Authorization": "Basic Y2Y6", "Accept": "application/json"}
-        response = requests.post("{}/{}".format(auth_endpoint, "oauth/token"), data=login_data, headers=headers, verify=self._verify).json()
-        self._token = response['access_token']
-        self._expires_at = int(response['expires_in']) + time.time()
+        return self._grant(login_data)
 
-        self._session = requests.Session()
-        self._session.headers.update(self._auth_args())
+    def _use_token(self, token):
+        self._credentials = token
 
-        return self._token
+    def _renew_token(self):
+        """
+        Refreshes the access token if it expires within REFRESH_MARGIN seconds.  Callers racing here share one
+        refresh: whoever gets the lock first renews the token and the others pick it up from the token cache.
+        """
+        if not self._credentials.expires_within(REFRESH_MARGIN):
+            return
+        with self._tokens.lock(self._target, self._username):
+            token = self._tokens.get(self._target, self._username, self._password)
+            if token is None or token.expires_within(REFRESH_MARGIN):
+                logging.info("Refreshing access token for {}".format(self._username))
+                refresh_token = self._credentials.refresh_token
+                try:
+                    if refresh_token is None:
+                        raise CloudFoundryAuthenticationException("No refresh token")
+                    token = self._grant({"grant_type": "refresh_token", "refresh_token": refresh_token})
+                except (CloudFoundryAuthenticationException, requests.RequestException) as e:
+                    if self._password is None:
+                        raise
+                    logging.warn("Token refresh failed ({}), logging in again".format(e))
+                    token = self._password_grant()
+            self._use_token(token)
 
     def _auth_args(self):
         headers = {'Accept': 'application/json'}
-        headers.update({'Authorization': 'bearer {}'.format(self._token)})
-        logging.debug("Returning Final Headers: {}".format(headers))
+        headers.update({'Authorization': 'bearer {}'.format(self._credentials.access_token)})
+        logging.debug("Returning Final Headers: {}".format(redact(str(headers))))
         return headers
 
-    def _request(self, url, request_type=requests.get, data=None, verify=None, raw_data = False, files=None):
+    def _request(self, url, request_type=requests.get, data=None, verify=None, raw_data = False, files=None,
+                 headers=None, timeout=None, cached=True, retry=True):
 
         if verify is None:
             verify = self._verify
 
-        if not self.live:
+        if self._credentials is None:
             raise CloudFoundryException("Auth Required and Not Logged In")
+        self._renew_token()
 
         if data and not raw_data:
             data = json.dumps(data)
         full_url = urljoin(self._target, url)
 
-        response = self._session.request(request_type.__name__, full_url, verify=verify, data=data, files=files)
+        method = request_type.__name__.upper()
+        if method == 'GET' and data is None and files is None:
+            # Identical GETs in flight at the same time share one response
+            key = (method, full_url, verify, tuple(sorted((headers or {}).items())), cached, retry)
+            return self._flights.do(key, self._send, method, url, full_url, verify, data, files, headers, timeout,
+                                    cached, retry)
+        return self._send(method, url, full_url, verify, data, files, headers, timeout, retry=retry)
 
-        if response.status_code in range(200,299):
-            return response
-        elif response.status_code == 404:
-            raise CloudFoundryException("HTTP {} - {}".format(response.status_code, response.text))
+    def _send(self, method, url, full_url, verify, data, files, headers, timeout=None, cached=True, retry=True):
+        """
+        Sends a request, retrying it as the retry policy allows, and notifies the hooks
+
+        :param timeout: (connect, read) timeouts overriding those of the transport
+        :type timeout: tuple
+        :param cached: Whether a GET goes through the response cache
+        :type cached: bool
+        :param retry: Whether the retry policy applies, or the request is sent once
+        :type retry: bool
+        """
+        # A streamed body is consumed by the first attempt and cannot be sent again
+        replayable = retry and not hasattr(data, 'read') and files is None
+        cacheable = cached and method == 'GET' and data is None and files is None
+        conditional = cacheable
+        attempt = 0
+        response = None
+        cache_hit = False
+        started = time.time()
+        try:
+            while True:
+                if self._limiter is not None:
+                    self._limiter.acquire()
+                # The transport may be shared by several users, so credentials go with each request
+                request_headers = self._auth_args()
+                if conditional:
+                    request_headers.update(self._responses.conditional_headers(full_url))
+                request_headers.update(headers or {})
+                try:
+                    response = self._transport.request(method, full_url, verify=verify, data=data, files=files,
+                                                       headers=request_headers,
+                                                       timeout=timeout or self._transport.timeout)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    if not (replayable and self._retry.should_retry(method, attempt)):
+                        raise
+                    delay = self._retry.delay(attempt)
+                    logging.warn("{} {} failed ({}), retrying in {:.1f}s".format(method, url, e, delay))
+                else:
+                    if self._limiter is not None:
+                        self._limiter.observe(response)
+                    if response.status_code == 304 and conditional:
+                        replayed = self._responses.replay(full_url, response)
+                        if replayed is not None:
+                            cache_hit = True
+                            return replayed
+                        # The stored body was evicted after the request was made: ask again for the full response
+                        logging.debug("{} {} not modified but no longer cached, fetching it again".format(method, url))
+                        conditional = False
+                        continue
+                    if 200 <= response.status_code < 300:
+                        if cacheable:
+                            self._responses.store(full_url, response)
+                        return response
+                    if not (replayable and self._retry.should_retry(method, attempt, response)):
+                        break
+                    delay = self._retry.delay(attempt, response)
+                    logging.warn("{} {} returned HTTP {}, retrying in {:.1f}s".format(
+                        method, url, response.status_code, delay))
+                time.sleep(delay)
+                attempt += 1
+                self._renew_token()
+        finally:
+            if self._hooks:
+                self._notify('on_request', RequestEvent(
+                    method, url_template(url), response.status_code if response is not None else None,
+                    len(response.content) if response is not None and not cache_hit else 0, time.time() - started,
+                    attempt, cache_hit))
+
+        if response.status_code == 404:
+            raise CloudFoundryNotFoundException("HTTP {} - {}".format(response.status_code, response.text))
+        elif response.status_code in RETRY_STATUSES:
+            raise CloudFoundryUnavailableException("HTTP {} - {}".format(response.status_code, response.text))
         else:
             raise CloudFoundryException("HTTP {} - {}".format(response.status_code, response.text))
 
+    def _notify(self, callback, event):
+        notify(self._hooks, callback, event)
+
+    def add_hook(self, hook):
+        """
+        Registers an instrumentation hook
+
+        :type hook: cloudfoundry.metrics.MetricsHook
+        """
+        self._hooks.append(hook)
+
     def _get_or_exception(self, url, json=True, **kwargs):
 
         if json:
-            final_dict = {}
-            response = self._request(url, **kwargs)
-            final_dict.update(response.json())
-            while 'next_url' in response.json() and response.json()['next_url'] is not None:
-                response = self._request(response.json()['next_url'], **kwargs)
-                final_dict.update(response.json())
-
+            final_dict = self._get_page(url, **kwargs)
+            if 'resources' in final_dict:
+                # Listing: gather every page instead of keeping only the last one.  Decoded pages may be shared
+                # through the response cache, so fill in a copy.
+                final_dict = dict(final_dict)
+                resources = []
+                for page in self._paginator_for(**kwargs).pages(url, first=final_dict):
+                    resources.extend(page.get('resources', []))
+                final_dict['resources'] = resources
+                final_dict['next_url'] = None
             return final_dict
         else:
             return self._request(url, **kwargs).text
 
+    def _get_page(self, url, **kwargs):
+        response = self._request(url, **kwargs)
+        if not kwargs.get('cached', True):
+            return response.json()
+        return self._responses.json(urljoin(self._target, url), response)
+
+    def _paginator_for(self, **kwargs):
+        if not kwargs:
+            return self._paginator
+        return Paginator(lambda page: self._get_page(page, **kwargs),
+                         max_workers=self._paginator.max_workers,
+                         results_per_page=self._paginator.results_per_page)
+
+    def _iter_resources(self, url, **kwargs):
+        """
+        Generator over every resource of a paginated listing.  Pages after the first are fetched concurrently.
+
+        :param url: The listing URL (e.g. v2/apps)
+        :type url: str
+        """
+        return self._paginator_for(**kwargs).iter_resources(url)
+
+    def _get_all_resources(self, url, **kwargs):
+        """
+        Every resource of a paginated listing, collected into a list
+
+        :param url: The listing URL (e.g. v2/apps)
+        :type url: str
+        :rtype: list
+        """
+        return self._paginator_for(**kwargs).all_resources(url)
+
     def _post_or_exception(self, url, json=True, **kwargs):
         if json:
             return self._request(url, request_type=requests.post, **kwargs).json()
@@ -128,10 +455,11 @@ class CloudFoundryInterface(object):
 
     @property
     def live(self):
-        current_time = time.time()
-        if current_time > self._expires_at:
-            return False
-        return True
+        """
+        Whether the interface holds an unexpired access token
+        """
+        credentials = self._credentials
+        return credentials is not None and time.time() < credentials.expires_at
 
 
 
@@ -164,120 +492,731 @@ class CloudFoundryInterface(object):
         return self._domains
 
 
-    @memo(max_age=max_cache_time)
     def _update_orgs(self):
-        logging.info("Updating all orgs as user {}".format(self.username))
-        raw = self._get_or_exception("v2/organizations")['resources']
-        orgs = {}
-        for org in raw:
-            org_data = org['entity']
-            metadata = org['metadata']
-            current_org = CloudFoundryOrg.from_dict(metadata,org_data)
-            orgs[current_org.guid] = current_org
-        self._orgs = orgs
-
-
-    @memo(max_age=max_cache_time)
+        self._update('orgs')
+
+
     def _update_spaces(self):
-        logging.info("Updating all spaces as user {}".format(self._username))
-        raw = self._get_or_exception("v2/spaces")['resources']
-        spaces = {}
-        for space in raw:
-            space_data = space['entity']
-            metadata = space['metadata']
-            current_org = CloudFoundrySpace.from_dict(metadata,space_data)
-            spaces[current_org.guid] = current_org
-        self._spaces = spaces
-
-
-    @memo(max_age=max_cache_time)
+        self._update('spaces')
+
+
     def _update_domains(self):
-        logging.info("Updating all domains as user {}".format(self._username))
-        domains = {}
-        shared_raw = self._get_or_exception("v2/shared_domains")['resources']
-        for domain in shared_raw:
-            domain_data = domain['entity']
-            metadata = domain['metadata']
-            current_domain = CloudFoundryDomain.from_dict(metadata,domain_data)
-            domains[current_domain.guid] = current_domain
-
-        private_raw = self._get_or_exception("v2/private_domains")['resources']
-        for domain in private_raw:
-            domain_data = domain['entity']
-            metadata = domain['metadata']
-            current_domain = CloudFoundryDomain.from_dict(metadata,domain_data)
-            domains[current_domain.guid] = current_domain
-
-        self._domains = domains
-
-
-    @memo(max_age=max_cache_time)
+        self._update('domains')
+
+
     def _update_apps(self):
-        logging.info("Updating all app as user {}".format(self._username))
-        raw = self._get_or_exception("v2/apps")['resources']
-        apps = {}
-        for app in raw:
-            app_data = app['entity']
-            metadata = app['metadata']
-            current_app = CloudFoundryApp.from_dict(metadata,app_data)
-            apps[current_app.guid] = current_app
-        self._apps = apps
-
-    @memo(max_age=max_cache_time)
+        self._update('apps')
+
     def _update_routes(self):
-        logging.info("Updating all routes as user {}".format(self._username))
-        raw = self._get_or_exception("v2/routes")['resources']
-        routes = {}
-        for route in raw:
-            route_data = route['entity']
-            metadata = route['metadata']
-            current_route = CloudFoundryRoute.from_dict(metadata,route_data)
-            routes[current_route.guid] = current_route
-        self._routes = routes
+        self._update('routes')
+
+    def _update(self, kind):
+        """
+        Makes sure a live collection of ``kind`` is installed.  Threads arriving while it is being refreshed wait
+        for that refresh instead of starting their own.
+        """
+        if self._load_cached(kind):
+            return
+        if self._stale_while_revalidate and getattr(self, '_' + kind) is not None:
+            logging.debug("Serving stale {} while they are refreshed".format(kind))
+            self._revalidate(kind)
+            return
+        self._flights.do(('refresh', kind), self._refresh_expired, kind)
+
+    def _refresh_expired(self, kind):
+        # Another thread may have refreshed the collection just before this one became the leader
+        if not self._load_cached(kind):
+            self._refresh(kind)
+
+    def _refresh(self, kind):
+        """
+        Fetches the collection of ``kind`` again, incrementally when possible
+        """
+        started = time.time()
+        incremental = self._can_sync(kind)
+        if incremental:
+            self._sync(kind)
+        else:
+            logging.info("Updating all {} as user {}".format(kind, self._username))
+            # A failed listing also leaves no high-water mark, so the next refresh lists everything again anyway
+            self._listed_at[kind] = started
+            paths, _ = RESOURCE_TYPES[kind]
+            raw = itertools.chain.from_iterable(self._iter_resources(path) for path in paths)
+            if kind in DELETE_EVENTS:
+                self._high_water.reset(kind)
+                raw = self._high_water.track(kind, raw)
+            self._set_collection(kind, raw)
+        latency = time.time() - started
+        logging.info("Refreshed {} {} in {:.2f}s".format(len(getattr(self, '_' + kind)), kind, latency))
+        if self._hooks:
+            self._notify('on_refresh', RefreshEvent(kind, latency, len(getattr(self, '_' + kind)), incremental))
+
+    def _can_sync(self, kind):
+        return (self._incremental and kind in DELETE_EVENTS and getattr(self, '_' + kind) is not None
+                and self._high_water.get(kind) is not None
+                and time.time() - self._listed_at.get(kind, 0) < self._full_resync_interval)
+
+    def _sync(self, kind):
+        """
+        Brings the collection of ``kind`` up to date: resources created or updated since the high-water mark are
+        refetched, and resources named by delete events since then are dropped.  The changes are applied to a copy
+        that then replaces the collection, so readers holding the old one never see a sync half done.
+        """
+        since = self._high_water.get(kind)
+        fetched_at = time.time()
+        logging.info("Syncing {} changed since {} as user {}".format(kind, since, self._username))
+        (path,), _ = RESOURCE_TYPES[kind]
+
+        # Timestamps have one second resolution, so use >= and accept refetching the newest resources
+        changed = {}
+        for field in ('updated_at', 'created_at'):
+            url = query_url(path, [u"{}>={}".format(field, since)])
+            for resource in self._high_water.track(kind, self._iter_resources(url)):
+                changed[resource['metadata']['guid']] = resource
+
+        events_url = query_url("v2/events", [u"type:{}".format(DELETE_EVENTS[kind]), u"timestamp>={}".format(since)])
+        deleted = set(event['entity'].get('actee') for event in self._iter_resources(events_url))
+        deleted.difference_update(changed)
+
+        with self._patch_lock:
+            collection = getattr(self, '_' + kind)
+            # The newest resources always come back, so only count those that really differ
+            changed = dict((guid, resource) for guid, resource in changed.items()
+                           if guid not in collection or collection.record(guid) != resource)
+            deleted = [guid for guid in deleted if guid in collection]
+            if changed or deleted:
+                collection = collection.copy()
+                for resource in changed.values():
+                    collection.put(resource)
+                for guid in deleted:
+                    del collection[guid]
+                setattr(self, '_' + kind, collection)
+                for guid in deleted:
+                    self._forget(kind, guid)
+                self._replace_snapshot(kind)
+            self._cache.set(kind, collection)
+        self._fetched_at[kind] = fetched_at
+        self._save_snapshot_later(kind)
+
+    def _load_cached(self, kind):
+        """
+        Installs the cached collection of ``kind``, if there is a live one
+
+        :return: Whether a cached collection was found
+        :rtype: bool
+        """
+        collection = self._cache.get(kind)
+        if collection is None:
+            collection = self._load_snapshot(kind)
+        if self._hooks:
+            self._notify('on_cache', CacheEvent(kind, collection is not None))
+        if collection is None:
+            return False
+        setattr(self, '_' + kind, collection)
+        return True
+
+    def _load_snapshot(self, kind):
+        """
+        On first access to ``kind``, installs its persisted snapshot if it is recent enough.  A snapshot older than
+        the cache TTL but within ``max_staleness`` is served while a background thread refreshes it.
+
+        :return: The collection, or None if there is no usable snapshot
+        :rtype: ResourceCollection
+        """
+        if self._snapshots is None:
+            return None
+        with self._patch_lock:
+            if kind in self._snapshots_loaded:
+                return None
+            self._snapshots_loaded.add(kind)
+        snapshot = self._snapshots.load(self._cache.namespace, kind)
+        if snapshot is None:
+            return None
+        age = time.time() - snapshot.fetched_at
+        if age > self._max_staleness:
+            logging.info("Ignoring {} snapshot from {:.0f}s ago".format(kind, age))
+            return None
+        logging.info("Loaded {} {} from snapshot taken {:.0f}s ago".format(len(snapshot.resources), kind, age))
+        collection = ResourceCollection(RESOURCE_TYPES[kind][1], COLLECTION_INDEXES[kind], snapshot.resources,
+                                        client=self)
+        setattr(self, '_' + kind, collection)
+        self._fetched_at[kind] = snapshot.fetched_at
+        self._snapshots_saved.add(kind)
+        if snapshot.listed_at is not None:
+            self._listed_at[kind] = snapshot.listed_at
+        if snapshot.high_water is not None:
+            self._high_water.set(kind, snapshot.high_water)
+        ttl = self._cache.ttl(kind) - age
+        if ttl > 0:
+            self._cache.set(kind, collection, ttl=ttl)
+        else:
+            # Serve it for at most the rest of the staleness bound; the refresh replaces it
+            self._cache.set(kind, collection, ttl=self._max_staleness - age)
+            self._revalidate(kind)
+        return collection
+
+    def _revalidate(self, kind):
+        """
+        Refreshes the collection of ``kind`` on a background thread, unless that is already happening
+        """
+        with self._patch_lock:
+            if kind in self._revalidating:
+                return
+            self._revalidating.add(kind)
+        thread = threading.Thread(target=self._background_refresh, args=(kind,),
+                                  name="cloudfoundry-revalidate-{}".format(kind))
+        thread.daemon = True
+        thread.start()
+
+    def _background_refresh(self, kind):
+        try:
+            self._flights.do(('refresh', kind), self._refresh, kind)
+        except Exception as e:
+            logging.warn("Background refresh of {} failed: {}".format(kind, e))
+        finally:
+            with self._patch_lock:
+                self._revalidating.discard(kind)
+
+    def _save_snapshot_later(self, kind):
+        """
+        Saves the snapshot of ``kind`` on a background thread, so that readers waiting for a refresh do not also wait
+        for the collection to be encoded and written.  Requests made while a save is pending are merged into it.  The
+        writer is not a daemon thread: a process that exits right after a fetch waits for its snapshots to be written.
+        """
+        if self._snapshots is None:
+            return
+        with self._patch_lock:
+            self._pending_saves.add(kind)
+            if self._snapshot_writer:
+                return
+            self._snapshot_writer = True
+        thread = threading.Thread(target=self._write_snapshots, name="cloudfoundry-snapshots")
+        thread.start()
+
+    def _write_snapshots(self):
+        while True:
+            with self._patch_lock:
+                if not self._pending_saves:
+                    self._snapshot_writer = False
+                    return
+                kind = self._pending_saves.pop()
+            try:
+                self._save_snapshot(kind)
+            except Exception as e:
+                logging.warn("Saving the {} snapshot failed: {}".format(kind, e))
+
+    def _save_snapshot(self, kind):
+        """
+        Writes the snapshot of ``kind``.  If the stored snapshot already holds the same records, only its fetch time
+        and high-water mark are updated.
+        """
+        if self._snapshots is None:
+            return
+        with self._patch_lock:
+            version = self._snapshot_versions.get(kind, 0)
+            fetched_at = self._fetched_at[kind]
+            high_water = self._high_water.get(kind)
+            listed_at = self._listed_at.get(kind)
+            resources = None
+            if kind not in self._snapshots_saved:
+                collection = getattr(self, '_' + kind)
+                resources = [record for guid, record in collection.records() if record is not None]
+        if resources is None:
+            self._snapshots.touch(self._cache.namespace, kind, fetched_at, high_water, listed_at)
+        else:
+            self._snapshots.save(self._cache.namespace, kind, resources, fetched_at, high_water, listed_at)
+        with self._patch_lock:
+            if self._snapshot_versions.get(kind, 0) == version:
+                self._snapshots_saved.add(kind)
+                return
+        # The collection changed while it was being written, so the snapshot may not match it
+        self._snapshots.delete(self._cache.namespace, kind)
+
+    def _replace_snapshot(self, kind):
+        """
+        Notes that the collection of ``kind`` was replaced by newer records, which its snapshot does not hold yet
+        """
+        with self._patch_lock:
+            self._snapshot_versions[kind] = self._snapshot_versions.get(kind, 0) + 1
+            self._snapshots_saved.discard(kind)
+
+    def _drop_snapshot(self, kind):
+        """
+        Deletes the snapshot of ``kind`` once the collection has been changed locally and no longer matches it
+        """
+        with self._patch_lock:
+            self._snapshot_versions[kind] = self._snapshot_versions.get(kind, 0) + 1
+            if kind not in self._snapshots_saved:
+                return
+            self._snapshots_saved.discard(kind)
+        self._snapshots.delete(self._cache.namespace, kind)
+
+    def save_snapshots(self):
+        """
+        Persists every collection held in memory, including changes made through this interface since it was
+        fetched.  Snapshots are otherwise only written when a collection is fetched.
+        """
+        for kind in RESOURCE_TYPES:
+            if getattr(self, '_' + kind) is not None:
+                self._replace_snapshot(kind)
+                self._save_snapshot(kind)
+
+    def _set_collection(self, kind, resources):
+        """
+        Installs a freshly fetched collection of ``kind`` from its raw resources, indexes it and caches it.  Model
+        objects are only built as they are accessed.
+        """
+        fetched_at = time.time()
+        resources = list(resources)
+        previous = getattr(self, '_' + kind)
+        # Models are always rebuilt, so a refresh discards local changes to them even when nothing changed upstream
+        collection = ResourceCollection(RESOURCE_TYPES[kind][1], COLLECTION_INDEXES[kind], resources, client=self)
+        if previous is not None and previous.holds(resources):
+            # Every page came back unchanged: the stored snapshot still matches
+            logging.debug("{} unchanged".format(kind))
+        else:
+            self._replace_snapshot(kind)
+        with self._patch_lock:
+            setattr(self, '_' + kind, collection)
+            self._cache.set(kind, collection)
+            # Resources fetched one by one are superseded by the full listing
+            self._cache.invalidate(kind + '.known')
+        self._fetched_at[kind] = fetched_at
+        self._save_snapshot_later(kind)
+
+    @property
+    def cache(self):
+        """
+        The cache holding this interface's collections; see its ``stats`` for hit/miss/eviction counters
+
+        :rtype: cloudfoundry.cache.ResourceCache
+        """
+        return self._cache
+
+    def _is_warm(self, kind):
+        """
+        Whether the full collection of ``kind`` was fetched recently enough to answer lookups locally
+        """
+        return self._load_cached(kind)
+
+    def query(self, kind, filters=None, results_per_page=None, order_direction=None):
+        """
+        Runs a server-side filtered listing rather than downloading the whole collection
+
+        :param kind: One of apps, orgs, spaces, routes or domains
+        :type kind: str
+        :param filters: v2 ``q`` filters, either as strings (e.g. ``['name:foo', 'host IN a,b']``) or a dict of field
+            to value (list values become ``IN`` filters)
+        :type filters: list or dict
+        :param results_per_page: Page size, at most 100
+        :type results_per_page: int
+        :param order_direction: 'asc' or 'desc'
+        :type order_direction: str
+        :return: The matching resources as model objects
+        :rtype: list
+        """
+        paths, model = RESOURCE_TYPES[kind]
+        if results_per_page is None:
+            paginator = self._paginator
+        else:
+            paginator = Paginator(self._get_page, max_workers=self._paginator.max_workers,
+                                  results_per_page=results_per_page)
+        results = []
+        for path in paths:
+            url = query_url(path, filters, order_direction=order_direction)
+            logging.debug("Querying {}".format(url))
+            for resource in paginator.iter_resources(url):
+                results.append(self._model(kind, resource))
+        return results
+
+    def watch(self, kind, callback, events=WATCH_EVENTS, space=None, name=None):
+        """
+        Subscribes to changes in a collection.  All watches of an interface share one poll of each watched
+        collection, every ``watch_interval`` seconds, which compares resources by guid and ``updated_at``.  The
+        first poll sets the baseline, so only later changes are reported.
+
+        :param kind: apps, routes, spaces, orgs or domains
+        :type kind: str
+        :param callback: Called as ``callback(event, obj)`` with event 'added', 'changed' or 'removed', from the
+            thread of the interface's watcher
+        :param events: The events of interest
+        :type events: tuple
+        :param space: Only report resources in this space
+        :type space: CloudFoundrySpace
+        :param name: Only report resources with this name (host, for routes)
+        :type name: str
+        :return: The subscription; call its ``cancel()`` to stop it
+        :rtype: cloudfoundry.watch.Watch
+        """
+        assert kind in RESOURCE_TYPES
+        assert set(events) <= set(WATCH_EVENTS)
+        if space is not None:
+            assert isinstance(space, CloudFoundrySpace)
+        watch = Watch(self._watcher, kind, callback, events, space.guid if space is not None else None, name)
+        self._watcher.add(watch)
+        return watch
+
+    def inventory(self, kinds=None):
+        """
+        A column-oriented snapshot of the foundation's apps, spaces, orgs, routes and stacks, streamed from the
+        listings without building model objects or touching the cached collections
+
+        :param kinds: Resource types to include, all of cloudfoundry.inventory.INVENTORY_TYPES by default
+        :type kinds: list
+        :rtype: cloudfoundry.inventory.Inventory
+        """
+        return Inventory.collect(self, kinds)
+
+    def export_inventory(self, kind, fp, format='csv'):
+        """
+        Streams every resource of ``kind`` straight to a file, page by page, without holding them in memory
+
+        :param kind: One of cloudfoundry.inventory.INVENTORY_TYPES (apps, spaces, orgs, routes, stacks)
+        :type kind: str
+        :param fp: File opened for writing (in binary mode for CSV)
+        :param format: 'csv' or 'jsonl'
+        :type format: str
+        :return: The number of rows written
+        :rtype: int
+        """
+        assert format in ('csv', 'jsonl')
+        if format == 'csv':
+            return export_csv(self, kind, fp)
+        return export_jsonl(self, kind, fp)
 
+    def _model(self, kind, resource):
+        """
+        Builds the model object of a raw resource record, attached to this interface
+        """
+        return build_model(RESOURCE_TYPES[kind][1], resource, self)
 
     def get_app(self,guid):
 
-        self._update_apps()
-        if guid in self.apps.keys():
-            return self.apps[guid]
+        if self._is_warm('apps'):
+            if guid in self._apps:
+                return self._apps[guid]
+        else:
+            app = self._fetch('apps', guid)
+            if app is not None:
+                return app
         logging.warn("{} not found, returning None".format(guid))
         return None
 
+    def get_route(self,guid):
+        """
+        Looks up a route by guid, with a single GET of v2/routes/{guid} unless the routes are cached
 
-    def get_app_by_name(self,name):
-        self._update_apps()
-        for app in self.apps.values():
-            if app.name == name:
-                return app
+        :rtype: CloudFoundryRoute
+        """
+        if self._is_warm('routes'):
+            if guid in self._routes:
+                return self._routes[guid]
+        else:
+            route = self._fetch('routes', guid)
+            if route is not None:
+                return route
+        logging.warn("{} not found, returning None".format(guid))
+        return None
+
+    def _fetch(self, kind, guid):
+        """
+        Refetches a single resource and patches it into the cached collections
+
+        :return: The resource as a model object, or None if it does not exist
+        """
+        resource = self._fetch_one(kind, guid)
+        if resource is None:
+            return None
+        return self._store(kind, resource)
+
+
+    def get_app_by_name(self,name,space=None):
+        """
+        Looks up an app by name.  App names are only unique within a space, so pass the space to disambiguate.
+
+        :param name: Name of the application
+        :type name: str
+        :param space: The space to look in, or None to return the first match in any space
+        :type space: CloudFoundrySpace
+        :rtype: CloudFoundryApp
+        """
+        if space is not None:
+            assert isinstance(space,CloudFoundrySpace)
+        if self._is_warm('apps'):
+            if space is not None:
+                app = self._apps.first('space_and_name', space.guid, name)
+            else:
+                app = self._apps.first('name', name)
+        else:
+            filters = {'name': name}
+            if space is not None:
+                filters['space_guid'] = space.guid
+            app = self._first_match('apps', filters)
+        if app is not None:
+            return app
         logging.warn("{} not found, returning None".format(name))
         return None
 
+    def get_apps_in_space(self,space):
+        """
+        All apps belonging to a space
+
+        :param space: The space to list
+        :type space: CloudFoundrySpace
+        :rtype: list
+        """
+        assert isinstance(space,CloudFoundrySpace)
+        if self._is_warm('apps'):
+            return self._apps.find('space', space.guid)
+        return self.query('apps', {'space_guid': space.guid})
 
     def get_space_by_name(self,name):
-        self._update_spaces()
-        for space in self.spaces.values():
-            if space.name == name:
-                return space
+        if self._is_warm('spaces'):
+            space = self._spaces.first('name', name)
+        else:
+            space = self._first_match('spaces', {'name': name})
+        if space is not None:
+            return space
         logging.warn("{} not found, returning None".format(name))
         return None
 
     def get_domain_by_name(self,name):
-        self._update_domains()
-        for domain in self.domains.values():
-            if domain.name == name:
-                return domain
+        if self._is_warm('domains'):
+            domain = self._domains.first('name', name)
+        else:
+            domain = self._first_match('domains', {'name': name})
+        if domain is not None:
+            return domain
         logging.warn("{} not found, returning None".format(name))
         return None
 
-    def get_route_by_name(self,name):
-        self._update_routes()
-        for route in self.routes.values():
-            if route.host == name:
-                return route
+    def get_route_by_name(self,name,domain=None):
+        """
+        Looks up a route by host.  The same host may exist under several domains, so pass the domain to disambiguate.
+
+        :param name: The hostname of the route
+        :type name: str
+        :param domain: The domain of the route, or None to return the first match in any domain
+        :type domain: CloudFoundryDomain
+        :rtype: CloudFoundryRoute
+        """
+        if domain is not None:
+            assert isinstance(domain,CloudFoundryDomain)
+        if self._is_warm('routes'):
+            if domain is not None:
+                route = self._routes.first('host_and_domain', name, domain.guid)
+            else:
+                route = self._routes.first('host', name)
+        else:
+            filters = {'host': name}
+            if domain is not None:
+                filters['domain_guid'] = domain.guid
+            route = self._first_match('routes', filters)
+        if route is not None:
+            return route
         logging.warn("{} not found, returning None".format(name))
         return None
 
+    def _first_match(self, kind, filters):
+        matches = self.query(kind, filters)
+        if matches:
+            return matches[0]
+        return None
+
+    def _store(self, kind, resource):
+        """
+        Puts a fresh copy of a resource, given as the raw record an API call returned, into the cached collection
+        (and the resources known individually, if it is there), updating its indexes
+
+        :return: The resource as a model object
+        """
+        guid = resource['metadata']['guid']
+        with self._patch_lock:
+            known = self._cache.get(kind + '.known')
+            if known is not None and guid in known:
+                known.put(resource)
+            collection = getattr(self, '_' + kind)
+            if collection is None:
+                return known[guid] if known is not None and guid in known else self._model(kind, resource)
+            collection.put(resource)
+            self._drop_snapshot(kind)
+            return collection[guid]
+
+    def _forget(self, kind, guid):
+        """
+        Drops a resource from the cached collection
+        """
+        with self._patch_lock:
+            known = self._cache.get(kind + '.known')
+            if known is not None and guid in known:
+                del known[guid]
+            collection = getattr(self, '_' + kind)
+            if collection is not None and guid in collection:
+                del collection[guid]
+                self._drop_snapshot(kind)
+
+    def _known(self, kind):
+        """
+        Where related resources of ``kind`` are looked up: the full collection while it is cached, otherwise a
+        partial one holding only the resources fetched individually or by prefetch, kept for the TTL of ``kind``
+        """
+        if self._load_cached(kind):
+            return getattr(self, '_' + kind)
+        with self._patch_lock:
+            known = self._cache.get(kind + '.known')
+            if known is None:
+                paths, model = RESOURCE_TYPES[kind]
+                known = ResourceCollection(model, COLLECTION_INDEXES[kind], client=self)
+                self._cache.set(kind + '.known', known, ttl=self._cache.ttl(kind))
+            return known
+
+    def _remember(self, kind, resources, known):
+        """
+        Puts raw records fetched while resolving relations into ``known``, the collection the caller got from
+        ``_known`` and will read them back from.  ``_known`` itself may answer differently by now, if the partial
+        collection expired or the full one was fetched meanwhile.
+
+        :return: Their guids, in order
+        :rtype: list
+        """
+        guids = []
+        with self._patch_lock:
+            for resource in resources:
+                known.put(resource)
+                guids.append(resource['metadata']['guid'])
+        return guids
+
+    def _relation_map(self, kind, relation):
+        """
+        Parent guid -> related guids for a to-many relation, kept for the TTL of the related kind
+        """
+        key = u"{}.{}".format(kind, relation)
+        with self._patch_lock:
+            related = self._cache.get(key)
+            if related is None:
+                related = {}
+                self._cache.set(key, related, ttl=self._cache.ttl(TO_MANY[(kind, relation)][0]))
+            return related
+
+    def _forget_relation(self, kind, relation, guid):
+        related = self._cache.get(u"{}.{}".format(kind, relation))
+        if related is not None:
+            related.pop(guid, None)
+
+    def _fetch_one(self, kind, guid):
+        """
+        The raw record of a single resource, or None if it does not exist
+        """
+        for path in RESOURCE_TYPES[kind][0]:
+            try:
+                return self._get_or_exception("{}/{}".format(path, guid))
+            except CloudFoundryNotFoundException:
+                continue
+        return None
+
+    def _resolve_relation(self, obj, relation):
+        """
+        Backs the relationship properties of the models (``app.space``, ``space.organization``, ``route.domain``...).
+        Related resources come from the cached collections when possible and are fetched (and kept) otherwise.
+
+        :return: A model object (or None) for to-one relations, a list of them for to-many relations
+        """
+        kind = obj._kind
+        if (kind, relation) in TO_ONE:
+            target, field = TO_ONE[(kind, relation)]
+            guid = getattr(obj, field)
+            if not guid:
+                return None
+            known = self._known(target)
+            if guid not in known:
+                logging.debug("Fetching {} {} of {} {}".format(relation, guid, kind, obj.guid))
+                resource = self._fetch_one(target, guid)
+                if resource is None:
+                    logging.warn("{} not found, returning None".format(guid))
+                    return None
+                self._remember(target, [resource], known)
+            return known[guid]
+
+        target, url_field = TO_MANY[(kind, relation)]
+        related = self._relation_map(kind, relation)
+        known = self._known(target)
+        guids = related.get(obj.guid)
+        if guids is None or any(guid not in known for guid in guids):
+            logging.debug("Listing {} of {} {}".format(relation, kind, obj.guid))
+            guids = related[obj.guid] = self._remember(target, self._iter_resources(getattr(obj, url_field)), known)
+        return [known[guid] for guid in guids]
+
+    def prefetch(self, objects, *relations):
+        """
+        Resolves relations of many objects up front, in a few batched requests instead of one request per object.
+        Relations may be chained with dots; afterwards the relationship properties answer from memory::
+
+            apps = cfi.query('apps', {'space_guid': space.guid})
+            cfi.prefetch(apps, 'space.organization', 'routes.domain')
+            for app in apps:
+                print(app.space.organization.name, [route.domain.name for route in app.routes])
+
+        :param objects: Model objects of a single resource type
+        :type objects: list
+        :param relations: Relation names, e.g. 'space', 'routes' or 'space.organization'
+        :type relations: str
+        :return: ``objects``
+        :rtype: list
+        """
+        objects = list(objects)
+        for path in relations:
+            level = objects
+            for relation in path.split('.'):
+                level = self._prefetch_relation(level, relation)
+        return objects
+
+    def _prefetch_relation(self, objects, relation):
+        """
+        Prefetches one relation of ``objects``
+
+        :return: The related objects, for the next step of a dotted relation
+        :rtype: list
+        """
+        if not objects:
+            return []
+        kind = objects[0]._kind
+        if (kind, relation) in TO_ONE:
+            target, field = TO_ONE[(kind, relation)]
+            wanted = set(getattr(obj, field) for obj in objects)
+            wanted.discard(None)
+            wanted.discard('')
+            known = self._known(target)
+            missing = [guid for guid in wanted if guid not in known]
+            for batch in batches(missing):
+                for path in RESOURCE_TYPES[target][0]:
+                    self._remember(target, self._iter_resources(query_url(path, {'guid': batch})), known)
+            return [known[guid] for guid in wanted if guid in known]
+
+        target, url_field = TO_MANY[(kind, relation)]
+        related = self._relation_map(kind, relation)
+        known = self._known(target)
+        parents = dict((obj.guid, obj) for obj in objects)
+        missing = [guid for guid in parents
+                   if guid not in related or any(child not in known for child in related[guid])]
+        (path,), _ = RESOURCE_TYPES[kind]
+        for batch in batches(missing):
+            url = query_url(path, {'guid': batch}, params={'inline-relations-depth': 1, 'include-relations': relation})
+            for resource in self._iter_resources(url):
+                children = resource['entity'].get(relation)
+                if children is not None:
+                    related[resource['metadata']['guid']] = self._remember(target, children, known)
+        results = {}
+        for guid, obj in parents.items():
+            if guid not in related:
+                # The API leaves out inline lists above 50 entries; those are listed on their own
+                for child in self._resolve_relation(obj, relation):
+                    results[child.guid] = child
+                continue
+            for child in related[guid]:
+                if child in known:
+                    results[child] = known[child]
+        return results.values()
+
     def create_app(self,name, space):
         """
         Creates an application
@@ -292,56 +1231,190 @@ class CloudFoundryInterface(object):
         assert isinstance(space,CloudFoundrySpace)
         logging.warn("Creating new app in space {}".format(space.guid))
 
-        if self.get_app_by_name(name) is not None:
-            return self.get_app_by_name(name)
+        existing = self.get_app_by_name(name, space)
+        if existing is not None:
+            return existing
 
         response = self._post_or_exception("v2/apps",data={'name':name, 'space_guid':space.guid})
-        metadata = response['metadata']
-        app_data = response['entity']
-        app = CloudFoundryApp.from_dict(metadata,app_data)
-        self._apps[app.guid] = app
-
-        return app
+        return self._store('apps', response)
 
     def delete_app(self,app):
         assert isinstance(app,CloudFoundryApp)
         logging.critical("Deleting App with GUID: {}".format(app.guid))
 
         self._delete_or_exception("v2/apps/{}".format(app.guid),json=False)
-        self._apps.pop(guid,None)
+        self._forget('apps', app.guid)
+        self._forget_relation('apps', 'routes', app.guid)
 
 
-    def upload_bits(self,app,path):
+    def _match_resources(self,path,workers=1):
+        """
+        Asks the API which files under ``path`` its blobstore already holds
+
+        :return: resource_match entries (fn, sha1, size, mode) for the files that need not be uploaded
+        :rtype: list
         """
-        Uploads the bits for an application, given the local path.  Creates the required zip file
+        files = []
+        for filename, relpath in iter_bits(path):
+            st = os.stat(filename)
+            if st.st_size >= RESOURCE_MATCH_MIN_SIZE:
+                files.append((filename, relpath, st))
+        digests = self._fingerprints.sha1_many([(filename, st) for filename, relpath, st in files], workers)
+        self._fingerprints.save()
+        candidates = [{'fn': relpath, 'sha1': digest, 'size': st.st_size, 'mode': file_mode(st)}
+                      for (filename, relpath, st), digest in zip(files, digests)]
+        if not candidates:
+            return []
+
+        matched = self._put_or_exception("v2/resource_match",
+                                         data=[{'sha1': c['sha1'], 'size': c['size']} for c in candidates])
+        known = set(match['sha1'] for match in matched)
+        resources = [c for c in candidates if c['sha1'] in known]
+        logging.info("{} of {} files already known to the blobstore".format(len(resources), len(candidates)))
+        return resources
+
+    def upload_bits(self,app,path,compresslevel=DEFAULT_COMPRESSLEVEL,spill_threshold=DEFAULT_SPILL_THRESHOLD,
+                    resource_match=True,workers=1,asynchronous=False):
+        """
+        Uploads the bits for an application, given the local path.  Creates the required zip file, spilling it to a
+        temporary file when it is large, and streams it to the API rather than loading it into memory.  Files the
+        blobstore already holds are left out of the zip and listed as resources instead.
+
+        With ``asynchronous``, the API processes the upload in a background job and this returns as soon as the
+        archive is sent, with a handle on the job::
+
+            job = cfi.upload_bits(app, path, asynchronous=True)
+            ...
+            job.result(timeout=300)
 
         :param app: The application to which we should upload the bits
         :type app: CloudFoundryApp
         :param path: The local path containing the bits
         :type path: str
+        :param compresslevel: DEFLATE level for the archive, 1 (fastest) to 9 (smallest)
+        :type compresslevel: int
+        :param spill_threshold: Archive size in bytes above which it is kept on disk instead of in memory
+        :type spill_threshold: int
+        :param resource_match: Whether to skip files the blobstore already holds (via v2/resource_match)
+        :type resource_match: bool
+        :param workers: Number of threads hashing and compressing files in parallel
+        :type workers: int
+        :param asynchronous: Let the API process the upload as a job (``async=true``) rather than wait for it
+        :type asynchronous: bool
+        :return: With ``asynchronous``, a handle whose ``result()`` waits for the job to finish
+        :rtype: cloudfoundry.polling.PollHandle
         """
         logging.info("Compressing bits in {} for upload to app {}".format(path,app.name))
         assert isinstance(path,(unicode,str,basestring))
         assert isinstance(app, CloudFoundryApp)
-        zipdata = create_bits_zip(path)
-        files_data = OrderedDict()
-        files_data['resources'] = (None,'[]')
-        files_data['application'] = zipdata.getvalue()
+        resources = self._match_resources(path, workers) if resource_match else []
+        zipdata = create_bits_zip(path, compresslevel=compresslevel, spill_threshold=spill_threshold,
+                                  exclude=set(resource['fn'] for resource in resources), workers=workers)
+        try:
+            body = MultipartBody([
+                ('resources', json.dumps(resources)),
+                ('application', zipdata, 'application.zip', 'application/zip'),
+            ])
+            logging.debug("Uploading {} byte multipart body".format(len(body)))
+
+            response = self._put_or_exception("v2/apps/{}/bits{}".format(app.guid,
+                                                                         "?async=true" if asynchronous else ""),
+                                              data=body,
+                                              raw_data = True,
+                                              headers={'Content-Type': body.content_type},
+                                              timeout=self._transport.upload_timeout
+                                              )
+        finally:
+            zipdata.close()
+        if asynchronous:
+            return self.wait_for_job(response['metadata']['guid'])
+
+    def _poll_get(self, url):
+        """
+        The single GET of a poll check.  The poller already backs off between checks, and retrying here (sleeping for
+        ``Retry-After`` included) would hold up every other wait sharing its thread.
 
-        #logging.debug(dict(files_data))
+        :return: The decoded response, or None if the API throttled the request or was unavailable
+        """
+        try:
+            return self._get_or_exception(url, retry=False)
+        except (CloudFoundryUnavailableException, requests.ConnectionError, requests.Timeout) as e:
+            logging.warn("Polling {} failed ({}), checking again later".format(url, e))
+            return None
 
-        self._put_or_exception("v2/apps/{}/bits".format(app.guid),
-                               files=files_data,
-                               raw_data = True
-                               )
+    def wait_for_job(self,guid,timeout=DEFAULT_WAIT_TIMEOUT):
+        """
+        Polls v2/jobs/{guid} with backoff, on the shared poller thread
 
-    def start_app(self,app):
+        :param guid: The job guid
+        :type guid: str
+        :return: A handle whose ``result()`` returns the finished job's entity or raises if the job failed
+        :rtype: cloudfoundry.polling.PollHandle
+        """
+        def check():
+            job = self._poll_get("v2/jobs/{}".format(guid))
+            if job is None:
+                return False, None
+            job = job['entity']
+            if job['status'] == 'failed':
+                details = job.get('error_details') or {}
+                raise CloudFoundryException("Job {} failed: {}".format(guid, details.get('description', job)))
+            return job['status'] == 'finished', job
+        return default_poller().submit(check, "job {}".format(guid), timeout=timeout)
+
+    def wait_for_app(self,app,state='RUNNING',timeout=DEFAULT_WAIT_TIMEOUT):
+        """
+        Polls an app until it is staged or running, on the shared poller thread.  Only v2/apps/{guid} (and, once it
+        is staged, v2/apps/{guid}/instances) are requested; the cached app is updated from them.
+
+        :param app: The app to watch
+        :type app: CloudFoundryApp
+        :param state: 'STAGED' to wait for staging, 'RUNNING' to also wait for every instance to run
+        :type state: str
+        :return: A handle whose ``result()`` returns the updated app, or raises if staging failed or an instance
+            crashed
+        :rtype: cloudfoundry.polling.PollHandle
+        """
+        assert isinstance(app, CloudFoundryApp)
+        assert state in ('STAGED', 'RUNNING')
+
+        def check():
+            current = self._poll_get("v2/apps/{}".format(app.guid))
+            if current is None:
+                return False, None
+            current = self._store('apps', current)
+            if current.package_state == 'FAILED':
+                raise CloudFoundryException("Staging of app {} failed: {}".format(
+                    current.name, current.staging_failed_reason))
+            if current.package_state != 'STAGED':
+                return False, current
+            if state == 'STAGED':
+                return True, current
+            instances = self._poll_get("v2/apps/{}/instances".format(app.guid))
+            if instances is None:
+                return False, current
+            states = [instance['state'] for instance in instances.values()]
+            if 'CRASHED' in states:
+                raise CloudFoundryException("App {} has crashed instances".format(current.name))
+            return len(states) >= current.instances and all(s == 'RUNNING' for s in states), current
+        return default_poller().submit(check, "app {} to be {}".format(app.name, state.lower()), timeout=timeout)
+
+
+    def start_app(self,app,wait=None,timeout=DEFAULT_WAIT_TIMEOUT):
         """
         Convinience function to start an app
         :param app: the application to start
         :type app: CloudFoundryApp
+        :param wait: None to return straight away, 'STAGED' or 'RUNNING' to block until the app gets there (see
+            wait_for_app)
+        :type wait: str
+        :param timeout: Seconds to wait at most
+        :type timeout: float
         """
-        self.update_app(app,{'state':'STARTED'})
+        app = self.update_app(app,{'state':'STARTED'})
+        if wait is None:
+            return app
+        return self.wait_for_app(app, wait, timeout).result()
 
     def update_app(self,app,changes):
         """
@@ -357,8 +1430,38 @@ class CloudFoundryInterface(object):
         assert isinstance(app, CloudFoundryApp)
         assert isinstance(changes,dict)
 
-        self._put_or_exception("/v2/apps/{}".format(app.guid),data=changes)
-        self._update_apps()
+        response = self._put_or_exception("/v2/apps/{}".format(app.guid),data=changes)
+        return self._store('apps', response)
+
+    def bulk_update_apps(self,items,concurrency=DEFAULT_BULK_CONCURRENCY):
+        """
+        Applies changes to many apps concurrently.  The cached apps are patched from each PUT response; nothing is
+        re-listed.
+
+        :param items: (app, changes) pairs, as taken by update_app
+        :type items: iterable
+        :param concurrency: Number of requests in flight at once
+        :type concurrency: int
+        :return: One BulkResult per item, holding the updated app or the error
+        :rtype: list
+        """
+        return run_bulk(self.update_app, items, concurrency)
+
+    def bulk_start_apps(self,apps,concurrency=DEFAULT_BULK_CONCURRENCY):
+        return self.bulk_update_apps([(app, {'state': 'STARTED'}) for app in apps], concurrency)
+
+    def bulk_stop_apps(self,apps,concurrency=DEFAULT_BULK_CONCURRENCY):
+        return self.bulk_update_apps([(app, {'state': 'STOPPED'}) for app in apps], concurrency)
+
+    def bulk_scale_apps(self,apps,instances=None,memory=None,disk_quota=None,concurrency=DEFAULT_BULK_CONCURRENCY):
+        """
+        Scales many apps to the same instance count and/or memory and disk quotas (in MB)
+        """
+        changes = dict((key, value) for key, value in
+                       (('instances', instances), ('memory', memory), ('disk_quota', disk_quota))
+                       if value is not None)
+        assert changes
+        return self.bulk_update_apps([(app, changes) for app in apps], concurrency)
 
     def create_route(self,host,domain,space):
         """
@@ -386,28 +1489,69 @@ class CloudFoundryInterface(object):
                                }
                             )
 
-        self._update_routes.delete() #Delete the caches for this function
-        return self.get_route_by_name(host)
+        return self._store('routes', new_route_raw)
 
 
 
     def add_route_to_app(self,app,route):
-        self._update_apps()
-        self._update_routes.delete()
-        self._update_routes()
+        """
+        Maps a route to an app
+
+        :return: The updated app
+        :rtype: CloudFoundryApp
+        """
+        return self._map_route(app, route)
+
+
+    def delete_route_from_app(self,app,route):
+        """
+        Unmaps a route from an app
+
+        :return: The updated app
+        :rtype: CloudFoundryApp
+        """
+        return self._unmap_route(app, route)
+
+    def _map_route(self,app,route):
         assert isinstance(app, CloudFoundryApp)
         assert isinstance(route, CloudFoundryRoute)
         logging.info("Adding route {} to app {}".format(route.host,app.name))
         response = self._put_or_exception("v2/apps/{}/routes/{}".format(app.guid,route.guid))
-        self._apps[app.guid] = CloudFoundryApp.from_dict(response['metadata'],response['entity'])
-        self._update_routes.delete()
-
-
-    def delete_route_from_app(self,app,route):
+        self._forget_relation('apps', 'routes', app.guid)
+        self._forget_relation('routes', 'apps', route.guid)
+        return self._store('apps', response)
 
+    def _unmap_route(self,app,route):
         assert isinstance(app,CloudFoundryApp)
         assert isinstance(route,CloudFoundryRoute)
         logging.info("Removing route {} to app {}".format(route.host, app.name))
         response = self._delete_or_exception("v2/apps/{}/routes/{}".format(app.guid,route.guid))
-        self._apps[app.guid] = CloudFoundryApp.from_dict(response['metadata'],response['entity'])
-        self._update_routes()
\ No newline at end of file
+        self._forget_relation('apps', 'routes', app.guid)
+        self._forget_relation('routes', 'apps', route.guid)
+        return self._store('apps', response)
+
+    def bulk_add_routes(self,items,concurrency=DEFAULT_BULK_CONCURRENCY):
+        """
+        Maps many routes to apps concurrently
+
+        :param items: (app, route) pairs
+        :type items: iterable
+        :param concurrency: Number of requests in flight at once
+        :type concurrency: int
+        :return: One BulkResult per item, holding the updated app or the error
+        :rtype: list
+        """
+        return run_bulk(self._map_route, items, concurrency)
+
+    def bulk_delete_routes(self,items,concurrency=DEFAULT_BULK_CONCURRENCY):
+        """
+        Unmaps many routes from apps concurrently
+
+        :param items: (app, route) pairs
+        :type items: iterable
+        :param concurrency: Number of requests in flight at once
+        :type concurrency: int
+        :return: One BulkResult per item, holding the updated app or the error
+        :rtype: list
+        """
+        return run_bulk(self._unmap_route, items, concurrency)
\ No newline at end of file
@@ -1,19 +1,45 @@
 import logging
 from pprint import pformat, pprint
+from cloudfoundry.models import CloudFoundryModel, intern_value
 
 
-class CloudFoundryApp(object):
+class CloudFoundryApp(CloudFoundryModel):
 
-    @classmethod
-    def get_class_name(cls):
-        return cls.__name__
+    _kind = 'apps'
 
-    def __str__(self):
-        # to show include all variables in sorted order
-        return "<{}>@0x{}:\n".format(self.get_class_name(),id(self)) + "\n".join(["  %s: %s" % (key.rjust(16), self.__dict__[key]) for key in sorted(set(self.__dict__))])
+    __slots__ = (
+        'buildpack',
+        'command',
+        'console',
+        'debug',
+        'detected_buildpack',
+        'detected_start_command',
+        'disk_quota',
+        'docker_image',
+        'environment_json',
+        'health_check_timeout',
+        'instances',
+        'memory',
+        '_name',
+        'package_state',
+        'package_updated_at',
+        'production',
+        'space_guid',
+        'stack_guid',
+        'staging_failed_reason',
+        'staging_task_id',
+        'state',
+        'version',
+    )
 
-    def __repr__(self):
-        return self.__str__()
+    _urls = {
+        'url': ('/v2/apps/{}', 'guid'),
+        'events_url': ('/v2/apps/{}/events', 'guid'),
+        'routes_url': ('/v2/apps/{}/routes', 'guid'),
+        'service_bindings_url': ('/v2/apps/{}/service_bindings', 'guid'),
+        'space_url': ('/v2/spaces/{}', 'space_guid'),
+        'stack_url': ('/v2/stacks/{}', 'stack_guid'),
+    }
 
     def __init__(
         self,
@@ -49,37 +75,37 @@ class CloudFoundryApp(object):
 
 
     ):
-        self.buildpack=buildpack
+        CloudFoundryModel.__init__(self, metadata, kwargs)
+        self.buildpack=intern_value(buildpack)
         self.command=command
         self.console=console
         self.debug=debug
-        self.detected_buildpack=detected_buildpack
+        self.detected_buildpack=intern_value(detected_buildpack)
         self.detected_start_command=detected_start_command
         self.disk_quota=disk_quota
         self.docker_image=docker_image
         self.environment_json=environment_json
-        self.events_url=events_url
         self.health_check_timeout=health_check_timeout
         self.instances=instances
         self.memory=memory
         self._name=name
-        self.package_state=package_state
+        self.package_state=intern_value(package_state)
         self.package_updated_at=package_updated_at
         self.production=production
-        self.routes_url=routes_url
-        self.service_bindings_url=service_bindings_url
-        self.space_guid=space_guid
-        self.space_url=space_url
-        self.stack_guid=stack_guid
-        self.stack_url=stack_url
+        self.space_guid=intern_value(space_guid)
+        self.stack_guid=intern_value(stack_guid)
         self.staging_failed_reason=staging_failed_reason
         self.staging_task_id=staging_task_id
-        self.state=state
+        self.state=intern_value(state)
         self.version=version
-        self.guid = metadata['guid']
-        self.url = metadata['url']
-        for key, value in kwargs.items():
-            setattr(self, key, value)
+        self._check_urls(
+            url=metadata['url'],
+            events_url=events_url,
+            routes_url=routes_url,
+            service_bindings_url=service_bindings_url,
+            space_url=space_url,
+            stack_url=stack_url,
+        )
 
 
 
@@ -88,8 +114,20 @@ class CloudFoundryApp(object):
     def name(self):
         return self._name
 
+    @property
+    def space(self):
+        """
+        The CloudFoundrySpace the app belongs to
+        """
+        return self._related('space')
+
+    @property
+    def routes(self):
+        """
+        The CloudFoundryRoutes mapped to the app
+        """
+        return self._related('routes')
+
     @staticmethod
     def from_dict(metadata, dict):
         return CloudFoundryApp(metadata=metadata, **dict)
-
-
@@ -0,0 +1,129 @@
+from multiprocessing.pool import ThreadPool
+from cloudfoundry import CloudFoundryInterface
+from cloudfoundry.paging import DEFAULT_MAX_WORKERS
+
+
+DEFAULT_CONCURRENCY = 16
+
+
+def pool_size(concurrency, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    The keep-alive connections needed to run ``concurrency`` calls at once, each of which may page through a
+    listing on ``max_workers`` threads
+
+    :rtype: int
+    """
+    return concurrency + max_workers
+
+
+class AsyncCloudFoundryInterface(object):
+    """
+    Non-blocking counterpart of CloudFoundryInterface.  Every call is dispatched to a bounded pool of worker threads
+    and immediately returns a ``multiprocessing.pool.AsyncResult``; call ``.get()`` on it for the value, or pass
+    ``callback`` to be notified.  The model classes (CloudFoundryApp, CloudFoundrySpace, ...) and the cache are those
+    of the wrapped CloudFoundryInterface, so one controller can drive many foundations without a thread per call.
+
+    Usage::
+
+        cfi = AsyncCloudFoundryInterface(target, username=username, password=password)
+        cfi.login().get()
+        apps, spaces = cfi.apps(), cfi.spaces()
+        print(len(apps.get()), len(spaces.get()))
+    """
+
+    def __init__(self, target, concurrency=DEFAULT_CONCURRENCY, interface=None, **kwargs):
+        """
+        :param target: The CF API endpoint (e.g. https://api.run.pivotal.io)
+        :type target: str
+        :param concurrency: Number of calls allowed in flight at once.  Unless ``pool_maxsize`` is given, the HTTP
+            connection pool of the interface created here is sized to match (see ``pool_size``).
+        :type concurrency: int
+        :param interface: An existing CloudFoundryInterface to drive instead of creating one from ``kwargs``; size
+            its pool with ``pool_size(concurrency)`` when creating it
+        :type interface: CloudFoundryInterface
+        :param kwargs: Passed on to CloudFoundryInterface (username, password, verify, cache settings, ...)
+        """
+        if interface is None:
+            kwargs.setdefault('pool_maxsize', pool_size(concurrency, kwargs.get('max_workers', DEFAULT_MAX_WORKERS)))
+            interface = CloudFoundryInterface(target, **kwargs)
+        assert isinstance(interface, CloudFoundryInterface)
+        self.interface = interface
+        self.concurrency = concurrency
+        self._pool = ThreadPool(concurrency)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Stops accepting calls and waits for the outstanding ones to finish
+        """
+        self._pool.close()
+        self._pool.join()
+
+    def _submit(self, func, *args, **kwargs):
+        callback = kwargs.pop('callback', None)
+        return self._pool.apply_async(func, args, kwargs, callback)
+
+    def login(self, callback=None):
+        return self._submit(self.interface.login, callback=callback)
+
+    def apps(self, callback=None):
+        return self._submit(lambda: self.interface.apps, callback=callback)
+
+    def orgs(self, callback=None):
+        return self._submit(lambda: self.interface.orgs, callback=callback)
+
+    def spaces(self, callback=None):
+        return self._submit(lambda: self.interface.spaces, callback=callback)
+
+    def routes(self, callback=None):
+        return self._submit(lambda: self.interface.routes, callback=callback)
+
+    def domains(self, callback=None):
+        return self._submit(lambda: self.interface.domains, callback=callback)
+
+    def query(self, kind, filters=None, callback=None, **kwargs):
+        return self._submit(self.interface.query, kind, filters, callback=callback, **kwargs)
+
+    def get_app(self, guid, callback=None):
+        return self._submit(self.interface.get_app, guid, callback=callback)
+
+    def get_app_by_name(self, name, space=None, callback=None):
+        return self._submit(self.interface.get_app_by_name, name, space, callback=callback)
+
+    def get_space_by_name(self, name, callback=None):
+        return self._submit(self.interface.get_space_by_name, name, callback=callback)
+
+    def get_domain_by_name(self, name, callback=None):
+        return self._submit(self.interface.get_domain_by_name, name, callback=callback)
+
+    def get_route_by_name(self, name, domain=None, callback=None):
+        return self._submit(self.interface.get_route_by_name, name, domain, callback=callback)
+
+    def create_app(self, name, space, callback=None):
+        return self._submit(self.interface.create_app, name, space, callback=callback)
+
+    def delete_app(self, app, callback=None):
+        return self._submit(self.interface.delete_app, app, callback=callback)
+
+    def upload_bits(self, app, path, callback=None, **kwargs):
+        return self._submit(self.interface.upload_bits, app, path, callback=callback, **kwargs)
+
+    def start_app(self, app, callback=None, **kwargs):
+        return self._submit(self.interface.start_app, app, callback=callback, **kwargs)
+
+    def update_app(self, app, changes, callback=None):
+        return self._submit(self.interface.update_app, app, changes, callback=callback)
+
+    def create_route(self, host, domain, space, callback=None):
+        return self._submit(self.interface.create_route, host, domain, space, callback=callback)
+
+    def add_route_to_app(self, app, route, callback=None):
+        return self._submit(self.interface.add_route_to_app, app, route, callback=callback)
+
+    def delete_route_from_app(self, app, route, callback=None):
+        return self._submit(self.interface.delete_route_from_app, app, route, callback=callback)
@@ -0,0 +1,102 @@
+import hashlib
+import hmac
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+
+# Tokens are renewed once they are this close to expiring, in seconds
+REFRESH_MARGIN = 60
+
+
+class Token(namedtuple('Token', 'access_token refresh_token expires_at')):
+    """
+    An OAuth token from UAA, with the Unix time at which it expires
+    """
+    __slots__ = ()
+
+    def expires_within(self, seconds):
+        return self.expires_at - time.time() <= seconds
+
+
+class TokenCache(object):
+    """
+    Tokens per (target, username) and authorization endpoints per target, shared by every interface using the
+    cache, so that they do not each run a password grant.  Each (target, username) also has a lock, held while its
+    token is being obtained or refreshed: concurrent callers wait for that one grant instead of starting their own.
+
+    A token is only handed out to callers presenting the password it was obtained with.  The cache keeps a salted
+    hash of that password next to the token, never the password itself.
+    """
+
+    def __init__(self):
+        self._salt = os.urandom(16)
+        self._tokens = {}
+        self._endpoints = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _digest(self, password):
+        if password is None:
+            return None
+        if isinstance(password, unicode):
+            password = password.encode('utf-8')
+        return hmac.new(self._salt, password, hashlib.sha256).digest()
+
+    def get(self, target, username, password=None):
+        """
+        The cached token, or None if there is none or it was obtained with a different password
+
+        :rtype: Token
+        """
+        entry = self._tokens.get((target, username))
+        if entry is None:
+            return None
+        token, digest = entry
+        expected = self._digest(password)
+        if digest is None or expected is None:
+            return token if digest is expected else None
+        return token if hmac.compare_digest(digest, expected) else None
+
+    def set(self, target, username, token, password=None):
+        """
+        :param password: The password the token was obtained with (or that obtained the token it was refreshed
+            from), which callers of ``get`` must then present
+        :type password: str
+        """
+        self._tokens[(target, username)] = (token, self._digest(password))
+
+    def discard(self, target, username):
+        self._tokens.pop((target, username), None)
+
+    def endpoint(self, target):
+        """
+        The cached authorization endpoint of ``target``, or None
+        """
+        return self._endpoints.get(target)
+
+    def set_endpoint(self, target, endpoint):
+        self._endpoints[target] = endpoint
+
+    def lock(self, target, username):
+        with self._lock:
+            return self._locks.setdefault((target, username), threading.Lock())
+
+
+# The process-wide cache interfaces use unless given their own
+DEFAULT_TOKEN_CACHE = TokenCache()
+
+
+_SECRETS = re.compile(r'(bearer\s+|basic\s+|"(?:access|refresh)_token"\s*:\s*")[^\s"\',}]+', re.IGNORECASE)
+
+
+def redact(text):
+    """
+    Masks bearer/basic credentials and access or refresh tokens in ``text`` so it can be logged
+
+    >>> redact("{'Authorization': 'bearer eyJhbGciOi.abc'}")
+    "{'Authorization': 'bearer <redacted>'}"
+    """
+    return _SECRETS.sub(r'\1<redacted>', text)
@@ -0,0 +1,47 @@
+import logging
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+
+
+DEFAULT_BULK_CONCURRENCY = 8
+
+
+class BulkResult(namedtuple('BulkResult', ['item', 'result', 'error'])):
+    """
+    Outcome of one item of a bulk operation: ``result`` holds the return value on success, ``error`` the exception
+    on failure (the other one is None)
+    """
+    __slots__ = ()
+
+
+def run_bulk(func, items, concurrency=DEFAULT_BULK_CONCURRENCY):
+    """
+    Calls ``func(*item)`` for every item on a bounded pool of worker threads.  A failing item does not stop the
+    others; its exception is reported in its BulkResult instead.
+
+    :param func: The per-item operation
+    :type func: callable
+    :param items: Argument tuples, one per call
+    :type items: iterable
+    :param concurrency: Number of calls in flight at once
+    :type concurrency: int
+    :return: One BulkResult per item, in the order of ``items``
+    :rtype: list
+    """
+    def call(item):
+        try:
+            return BulkResult(item, func(*item), None)
+        except Exception as e:
+            # Whatever one item raises, e.g. an AssertionError on bad arguments, is that item's result
+            subject = item[0] if isinstance(item, tuple) and item else item
+            logging.warn("Bulk operation failed for {}: {}".format(getattr(subject, 'guid', subject), e))
+            return BulkResult(item, None, e)
+
+    items = list(items)
+    if not items:
+        return []
+    pool = ThreadPool(min(concurrency, len(items)))
+    try:
+        return pool.map(call, items)
+    finally:
+        pool.terminate()
@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_TTL = 10
+DEFAULT_MAX_ENTRIES = 128
+
+
+class CacheBackend(object):
+    """
+    Storage behind a ResourceCache.  Entries are opaque ``(expires_at, value)`` tuples keyed by strings.  Subclass
+    this to share entries between the interfaces of a process, e.g. with a different eviction policy.
+
+    Values are live objects: ResourceCollections holding a lock and their interface, which the interface keeps
+    patching in place after storing them.  A backend must therefore keep the very objects it is given, in memory and
+    in the same process; one that pickles them (to disk, memcached...) would fail or serve stale copies.  To persist
+    fetched collections across runs, use a cloudfoundry.snapshot.SnapshotStore instead.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, entry):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class LRUCacheBackend(CacheBackend):
+    """
+    In-memory backend holding at most ``max_entries`` entries, evicting the least recently used one first
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class ResourceCache(object):
+    """
+    Time-bounded cache of fetched resources, owned by one CloudFoundryInterface.  Entries are namespaced so that
+    interfaces for different targets or users can safely share one backend.
+    """
+
+    def __init__(self, namespace, ttls=None, default_ttl=DEFAULT_TTL, backend=None):
+        """
+        :param namespace: Prefix for every key, typically the target and username
+        :type namespace: str
+        :param ttls: Per resource type TTL in seconds (e.g. ``{'apps': 30, 'domains': 600}``)
+        :type ttls: dict
+        :param default_ttl: TTL for resource types missing from ``ttls``
+        :type default_ttl: int
+        :param backend: Where entries are kept, defaults to a private LRUCacheBackend
+        :type backend: CacheBackend
+        """
+        self.namespace = namespace
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.backend = backend if backend is not None else LRUCacheBackend()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+
+    def _key(self, kind):
+        return u"{}|{}".format(self.namespace, kind)
+
+    def ttl(self, kind):
+        return self.ttls.get(kind, self.default_ttl)
+
+    def get(self, kind):
+        """
+        The cached value for ``kind``, or None if it is missing or expired
+        """
+        key = self._key(kind)
+        entry = self.backend.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at >= time.time():
+                self.hits += 1
+                return value
+            self.backend.delete(key)
+            self.expirations += 1
+        self.misses += 1
+        return None
+
+    def set(self, kind, value, ttl=None):
+        if ttl is None:
+            ttl = self.ttl(kind)
+        self.backend.set(self._key(kind), (time.time() + ttl, value))
+
+    def invalidate(self, kind):
+        self.backend.delete(self._key(kind))
+
+    @property
+    def stats(self):
+        """
+        Hit, miss, expiration and (backend) eviction counters
+
+        :rtype: dict
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'expirations': self.expirations,
+            'evictions': getattr(self.backend, 'evictions', 0),
+        }
@@ -2,32 +2,37 @@ __author__ = 'mcowger'
 
 import logging
 from pprint import pformat, pprint
+from cloudfoundry.models import CloudFoundryModel, intern_value
 
-class CloudFoundryDomain(object):
+class CloudFoundryDomain(CloudFoundryModel):
 
-    @classmethod
-    def get_class_name(cls):
-        return cls.__name__
+    _kind = 'domains'
 
-    def __str__(self):
-        # to show include all variables in sorted order
-        return "<{}>@0x{}:\n".format(self.get_class_name(),id(self)) + "\n".join(["  %s: %s" % (key.rjust(16), self.__dict__[key]) for key in sorted(set(self.__dict__))])
+    __slots__ = (
+        '_name',
+        'owning_organization_guid',
+    )
 
-    def __repr__(self):
-        return self.__str__()
+    _urls = {
+        'owning_organization_url': ('/v2/organizations/{}', 'owning_organization_guid'),
+    }
 
     def __init__(
         self,
         name=None,
         metadata=None,
         owning_organization_guid=None,
-        owning_organization_url=None
+        owning_organization_url=None,
+        **kwargs
     ):
+        CloudFoundryModel.__init__(self, metadata, kwargs)
         self._name=name
-        self.owning_organization_guid=owning_organization_guid
-        self.owning_organization_url=owning_organization_url
-        self.guid = metadata['guid']
-        self.url = metadata['url']
+        self.owning_organization_guid=intern_value(owning_organization_guid)
+        # Shared and private domains live under different paths, so keep the url as given
+        self._set_extra('url', metadata['url'])
+        self._check_urls(
+            owning_organization_url=owning_organization_url,
+        )
 
 
 
@@ -41,6 +46,13 @@ class CloudFoundryDomain(object):
             return True
         return False
 
+    @property
+    def owning_organization(self):
+        """
+        The CloudFoundryOrg owning a private domain, None for shared domains
+        """
+        return self._related('owning_organization')
+
     @staticmethod
     def from_dict(metadata, dict):
-        return CloudFoundryDomain(metadata=metadata, **dict)
\ No newline at end of file
+        return CloudFoundryDomain(metadata=metadata, **dict)
@@ -0,0 +1,17 @@
+class CloudFoundryException(Exception):
+    pass
+
+
+class CloudFoundryNotFoundException(CloudFoundryException):
+    pass
+
+
+class CloudFoundryAuthenticationException(CloudFoundryException):
+    pass
+
+
+class CloudFoundryUnavailableException(CloudFoundryException):
+    """
+    The API throttled the request (429) or was briefly unavailable (502-504), and retries were exhausted or not allowed
+    """
+    pass
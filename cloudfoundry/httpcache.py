@@ -0,0 +1,171 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+
+# Budget for the bodies and decoded values kept, in bytes.  Refreshing a collection revalidates every page of its
+# listing, so this should hold the listings of the collections in use: about 2KB per resource, twice.
+DEFAULT_RESPONSE_CACHE_BYTES = 128 * 1024 * 1024
+
+
+class _Entry(object):
+    __slots__ = ('etag', 'last_modified', 'content', 'digest', 'parsed', 'parsed_size')
+
+    def __init__(self):
+        self.etag = None
+        self.last_modified = None
+        self.content = None
+        self.digest = None
+        self.parsed = None
+        self.parsed_size = 0
+
+    @property
+    def size(self):
+        # A decoded value is counted at the size of the body it was decoded from
+        return len(self.content or '') + self.parsed_size
+
+
+class ResponseCache(object):
+    """
+    Bounded LRU store of GET responses by URL.  For each URL it keeps the validators the server sent (``ETag``,
+    ``Last-Modified``) with the body, so the next request can be made conditional and a ``304 Not Modified`` answered
+    from the stored body.  It also remembers the digest of the last body decoded for a URL along with the decoded
+    JSON: an identical body, whether replayed after a 304 or sent again in full by a server without validators, is
+    not decoded again and yields the very same objects.  Treat those as read-only; models built from them get copies
+    of their mutable values.
+
+    The store is bounded by the size of what it keeps rather than by a number of URLs, so that a collection listed
+    in many small pages is kept whole as long as it fits.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_RESPONSE_CACHE_BYTES):
+        """
+        :param max_bytes: Total size of the bodies and decoded values kept, 0 to disable the cache.  A single body
+            larger than a quarter of it is never kept.
+        :type max_bytes: int
+        """
+        self.max_bytes = max_bytes
+        self.revalidated = 0
+        self.reused = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        """
+        Bytes currently counted against ``max_bytes``
+        """
+        return self._bytes
+
+    def _keeps(self, content):
+        return 0 < len(content) <= self.max_bytes / 4
+
+    def _get(self, url):
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            self._entries[url] = entry
+        return entry
+
+    def _update(self, url, change):
+        """
+        Applies ``change`` to the entry of ``url`` (created if missing), keeping the byte count and bound
+        """
+        entry = self._entries.pop(url, None)
+        if entry is None:
+            entry = _Entry()
+        else:
+            self._bytes -= entry.size
+        change(entry)
+        self._entries[url] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+
+    def conditional_headers(self, url):
+        """
+        The ``If-None-Match``/``If-Modified-Since`` headers to send for ``url``, empty if nothing is cached for it
+
+        :rtype: dict
+        """
+        headers = {}
+        with self._lock:
+            entry = self._get(url)
+            if entry is not None and entry.content is not None:
+                if entry.etag is not None:
+                    headers['If-None-Match'] = entry.etag
+                if entry.last_modified is not None:
+                    headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def store(self, url, response):
+        """
+        Keeps the validators and body of a successful GET, if the server sent any validators
+        """
+        if not self.max_bytes:
+            return
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag is None and last_modified is None:
+            return
+        content = response.content
+        if not self._keeps(content):
+            return
+
+        def change(entry):
+            entry.etag = etag
+            entry.last_modified = last_modified
+            entry.content = content
+
+        with self._lock:
+            self._update(url, change)
+
+    def replay(self, url, response):
+        """
+        Turns a ``304 Not Modified`` response for ``url`` into the cached ``200`` it stands for
+
+        :return: The response, or None if nothing is cached for ``url`` (any more)
+        :rtype: requests.Response
+        """
+        with self._lock:
+            entry = self._get(url)
+            if entry is None or entry.content is None:
+                return None
+            self.revalidated += 1
+            response.status_code = 200
+            response._content = entry.content
+            return response
+
+    def json(self, url, response):
+        """
+        Decodes the JSON body of a response to ``url``, reusing the last decoded value if the body is unchanged
+        """
+        content = response.content
+        if not self.max_bytes or not self._keeps(content):
+            return response.json()
+        digest = hashlib.sha1(content).digest()
+        with self._lock:
+            entry = self._get(url)
+            if entry is not None and entry.digest == digest:
+                self.reused += 1
+                return entry.parsed
+        parsed = json.loads(content)
+
+        def change(entry):
+            entry.digest = digest
+            entry.parsed = parsed
+            entry.parsed_size = len(content)
+
+        with self._lock:
+            self._update(url, change)
+        return parsed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
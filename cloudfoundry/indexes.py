@@ -0,0 +1,85 @@
+APP_INDEXES = {
+    'name': ('name',),
+    'space_and_name': ('space_guid', 'name'),
+    'space': ('space_guid',),
+}
+
+ROUTE_INDEXES = {
+    'host': ('host',),
+    'host_and_domain': ('host', 'domain_guid'),
+}
+
+NAME_INDEXES = {
+    'name': ('name',),
+}
+
+
+def field_value(resource, field):
+    """
+    Reads a field from either a raw v2 resource (``metadata``/``entity`` dict) or a model object
+    """
+    if isinstance(resource, dict):
+        if field == 'guid':
+            return resource['metadata']['guid']
+        return resource['entity'].get(field)
+    return getattr(resource, field, None)
+
+
+class ResourceIndex(object):
+    """
+    Secondary lookup tables over a guid-keyed collection of resources.  Each named index maps a key built from one
+    or more fields to the guids of the resources carrying that key.  Keys need not be unique: app names, for
+    instance, only have to be unique within a space.  Resources may be raw records or model objects.
+    """
+
+    def __init__(self, indexes, resources=()):
+        """
+        :param indexes: Index name to the tuple of field names making up its key
+        :type indexes: dict
+        :param resources: Resources to index straight away
+        :type resources: iterable
+        """
+        self._fields = dict(indexes)
+        self._tables = dict((name, {}) for name in self._fields)
+        for resource in resources:
+            self.add(resource)
+
+    @staticmethod
+    def _key(fields, resource):
+        if len(fields) == 1:
+            return field_value(resource, fields[0])
+        return tuple(field_value(resource, field) for field in fields)
+
+    def add(self, resource):
+        guid = field_value(resource, 'guid')
+        for name, fields in self._fields.items():
+            self._tables[name].setdefault(self._key(fields, resource), []).append(guid)
+
+    def discard(self, resource):
+        """
+        Removes ``resource`` (matched by guid) from every index it appears in.  Pass the resource as it was indexed,
+        as its keys are recomputed from it.
+        """
+        guid = field_value(resource, 'guid')
+        for name, fields in self._fields.items():
+            table = self._tables[name]
+            key = self._key(fields, resource)
+            bucket = table.get(key)
+            if not bucket:
+                continue
+            bucket[:] = [indexed for indexed in bucket if indexed != guid]
+            if not bucket:
+                del table[key]
+
+    def find(self, index, *key):
+        """
+        The guids of all resources whose ``index`` key matches
+
+        :param index: Name of the index to search
+        :type index: str
+        :param key: The key values, one per field of the index
+        :rtype: list
+        """
+        if len(key) == 1:
+            key = key[0]
+        return list(self._tables[index].get(key, ()))
@@ -0,0 +1,220 @@
+import csv
+import json
+import logging
+from array import array
+from collections import OrderedDict
+from cloudfoundry.models import intern_value
+
+
+# Listing path and columns exported per resource type.  Numeric columns are kept in arrays of C longs.
+INVENTORY_TYPES = OrderedDict([
+    ('apps', ('v2/apps', ('guid', 'name', 'state', 'memory', 'instances', 'disk_quota', 'space_guid', 'stack_guid'))),
+    ('spaces', ('v2/spaces', ('guid', 'name', 'organization_guid'))),
+    ('orgs', ('v2/organizations', ('guid', 'name'))),
+    ('routes', ('v2/routes', ('guid', 'host', 'domain_guid', 'space_guid'))),
+    ('stacks', ('v2/stacks', ('guid', 'name'))),
+])
+
+NUMERIC_COLUMNS = frozenset(['memory', 'instances', 'disk_quota'])
+# Low-cardinality columns whose values are shared rather than stored once per row
+SHARED_COLUMNS = frozenset(['state', 'space_guid', 'stack_guid', 'organization_guid', 'domain_guid'])
+
+
+def _row(resource, columns):
+    entity = resource['entity']
+    return [resource['metadata']['guid'] if column == 'guid' else entity.get(column) for column in columns]
+
+
+def iter_rows(interface, kind):
+    """
+    Streams the rows of one resource type straight from its paginated listing, without building model objects
+
+    :param interface: A logged in CloudFoundryInterface
+    :param kind: One of INVENTORY_TYPES
+    :type kind: str
+    :return: Generator of value lists, in the order of the type's columns
+    """
+    path, columns = INVENTORY_TYPES[kind]
+    # Pages are dropped as soon as they are read, so keep them out of the response cache too
+    for resource in interface._iter_resources(path, cached=False):
+        yield _row(resource, columns)
+
+
+def _encode(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+def export_csv(interface, kind, fp):
+    """
+    Writes every resource of ``kind`` to ``fp`` as CSV with a header row, one page at a time
+
+    :return: The number of rows written
+    :rtype: int
+    """
+    writer = csv.writer(fp)
+    writer.writerow(INVENTORY_TYPES[kind][1])
+    count = 0
+    for row in iter_rows(interface, kind):
+        writer.writerow([_encode(value) for value in row])
+        count += 1
+    return count
+
+
+def export_jsonl(interface, kind, fp):
+    """
+    Writes every resource of ``kind`` to ``fp`` as JSON lines, one object per resource, one page at a time
+
+    :return: The number of rows written
+    :rtype: int
+    """
+    columns = INVENTORY_TYPES[kind][1]
+    count = 0
+    for row in iter_rows(interface, kind):
+        fp.write(json.dumps(OrderedDict(zip(columns, row))))
+        fp.write('\n')
+        count += 1
+    return count
+
+
+class ColumnTable(object):
+    """
+    Resources of one type stored column by column: numeric columns in ``array('l')``, others in lists
+    """
+
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self._data = OrderedDict((column, array('l') if column in NUMERIC_COLUMNS else []) for column in columns)
+
+    def append(self, row):
+        for column, value in zip(self.columns, row):
+            if column in NUMERIC_COLUMNS:
+                value = value or 0
+            elif column in SHARED_COLUMNS:
+                value = intern_value(value)
+            self._data[column].append(value)
+
+    def __len__(self):
+        return len(self._data[self.columns[0]])
+
+    def __getitem__(self, column):
+        return self._data[column]
+
+    def rows(self):
+        return zip(*self._data.values())
+
+    def lookup(self, value_column):
+        """
+        guid -> ``value_column`` mapping
+        """
+        return dict(zip(self['guid'], self[value_column]))
+
+
+def _group_sum(keys, values):
+    totals = {}
+    for key, value in zip(keys, values):
+        totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+class Inventory(object):
+    """
+    Column-oriented snapshot of a whole foundation, for capacity planning.  Listings are streamed page by page into
+    the columns, so no model objects are built and memory stays close to the size of the data itself.
+
+    Usage::
+
+        inventory = cfi.inventory()
+        print(inventory.memory_by_org())
+        print(inventory.instances_by_stack())
+        with open('apps.csv', 'wb') as fp:
+            inventory.write_csv('apps', fp)
+    """
+
+    def __init__(self, tables):
+        """
+        :param tables: Resource type -> ColumnTable
+        :type tables: dict
+        """
+        self.tables = tables
+
+    @classmethod
+    def collect(cls, interface, kinds=None):
+        """
+        Builds an inventory from the listings of ``kinds`` (all of INVENTORY_TYPES by default)
+
+        :param interface: A logged in CloudFoundryInterface
+        """
+        tables = OrderedDict()
+        for kind in kinds or INVENTORY_TYPES:
+            table = tables[kind] = ColumnTable(INVENTORY_TYPES[kind][1])
+            for row in iter_rows(interface, kind):
+                table.append(row)
+            logging.info("Inventoried {} {}".format(len(table), kind))
+        return cls(tables)
+
+    def __getitem__(self, kind):
+        return self.tables[kind]
+
+    def write_csv(self, kind, fp):
+        table = self.tables[kind]
+        writer = csv.writer(fp)
+        writer.writerow(table.columns)
+        for row in table.rows():
+            writer.writerow([_encode(value) for value in row])
+
+    def write_jsonl(self, kind, fp):
+        table = self.tables[kind]
+        for row in table.rows():
+            fp.write(json.dumps(OrderedDict(zip(table.columns, row))))
+            fp.write('\n')
+
+    def _app_memory(self, started_only):
+        # Memory reserved per app: its per-instance memory times its instance count
+        apps = self.tables['apps']
+        memory = [m * i for m, i in zip(apps['memory'], apps['instances'])]
+        if started_only:
+            memory = [m if state == 'STARTED' else 0 for m, state in zip(memory, apps['state'])]
+        return memory
+
+    def memory_by_space(self, started_only=False):
+        """
+        Total app memory in MB (memory times instances) per space, keyed by 'org/space' name
+
+        :param started_only: Only count started apps
+        :type started_only: bool
+        :rtype: dict
+        """
+        totals = _group_sum(self.tables['apps']['space_guid'], self._app_memory(started_only))
+        labels = self._space_labels()
+        return dict((labels.get(guid, guid), total) for guid, total in totals.items())
+
+    def memory_by_org(self, started_only=False):
+        """
+        Total app memory in MB (memory times instances) per org name
+
+        :param started_only: Only count started apps
+        :type started_only: bool
+        :rtype: dict
+        """
+        space_orgs = self.tables['spaces'].lookup('organization_guid')
+        org_names = self.tables['orgs'].lookup('name')
+        orgs = [org_names.get(space_orgs.get(guid), guid) for guid in self.tables['apps']['space_guid']]
+        return _group_sum(orgs, self._app_memory(started_only))
+
+    def instances_by_stack(self):
+        """
+        Total app instances per stack name
+
+        :rtype: dict
+        """
+        stack_names = self.tables['stacks'].lookup('name')
+        apps = self.tables['apps']
+        return _group_sum([stack_names.get(guid, guid) for guid in apps['stack_guid']], apps['instances'])
+
+    def _space_labels(self):
+        org_names = self.tables['orgs'].lookup('name')
+        spaces = self.tables['spaces']
+        return dict((guid, u"{}/{}".format(org_names.get(org_guid, org_guid), name))
+                    for guid, name, org_guid in zip(spaces['guid'], spaces['name'], spaces['organization_guid']))
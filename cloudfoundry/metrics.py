@@ -0,0 +1,182 @@
+import bisect
+import logging
+import re
+import threading
+from collections import namedtuple
+
+
+# Upper bounds in seconds of the latency histogram buckets; the last bucket is open-ended
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_GUID = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE)
+
+
+class RequestEvent(namedtuple('RequestEvent', 'method url_template status bytes latency retries cache_hit')):
+    """
+    One API call: the method, the URL with guids replaced by ``{guid}`` and no query string, the final status
+    (None if no response arrived), the response size in bytes, the total time in seconds including retries, the
+    number of retries, and whether the response was served from a cache
+    """
+    __slots__ = ()
+
+
+class CacheEvent(namedtuple('CacheEvent', 'kind hit')):
+    """
+    A lookup of the cached collection of ``kind``
+    """
+    __slots__ = ()
+
+
+class RefreshEvent(namedtuple('RefreshEvent', 'kind latency count incremental')):
+    """
+    A refresh of the collection of ``kind``: how long it took, how many resources it ended with and whether it was
+    an incremental sync rather than a full listing
+    """
+    __slots__ = ()
+
+
+def url_template(url):
+    """
+    Groups URLs by endpoint: drops the scheme, host and query string and replaces guids with ``{guid}``
+
+    >>> url_template('https://api.example.com/v2/apps/6b5d7e3a-0e2f-4c3e-9a4b-1d2c3b4a5f6e/routes?page=2')
+    'v2/apps/{guid}/routes'
+    """
+    path = url.split('?', 1)[0]
+    if '://' in path:
+        path = path.split('://', 1)[1].partition('/')[2]
+    return '/'.join('{guid}' if _GUID.match(segment) else segment for segment in path.strip('/').split('/'))
+
+
+class MetricsHook(object):
+    """
+    Receives instrumentation events from a CloudFoundryInterface.  Subclass it and override the callbacks you need
+    to feed an exporter.  Callbacks run on the thread making the call, so keep them quick.
+    """
+
+    def on_request(self, event):
+        """
+        :type event: RequestEvent
+        """
+
+    def on_cache(self, event):
+        """
+        :type event: CacheEvent
+        """
+
+    def on_refresh(self, event):
+        """
+        :type event: RefreshEvent
+        """
+
+
+class Histogram(object):
+    """
+    Counts of observations per bucket, with their sum
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding the ``q`` quantile (e.g. 0.99), None for the open-ended bucket or when
+        nothing was observed
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+
+class HistogramCollector(MetricsHook):
+    """
+    Keeps in-memory latency histograms per endpoint (method and URL template) and per refreshed resource type, along
+    with byte, retry, error and cache hit counters.  ``summary()`` gives a snapshot fit for logging or exporting.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.requests = {}
+        self.refreshes = {}
+        self.bytes = {}
+        self.retries = {}
+        self.errors = {}
+        self.cache_hits = {}
+        self.cache_misses = {}
+        self._lock = threading.Lock()
+
+    def on_request(self, event):
+        key = (event.method, event.url_template)
+        with self._lock:
+            self.requests.setdefault(key, Histogram(self.buckets)).observe(event.latency)
+            self.bytes[key] = self.bytes.get(key, 0) + event.bytes
+            self.retries[key] = self.retries.get(key, 0) + event.retries
+            if event.status is None or event.status >= 400:
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+    def on_cache(self, event):
+        counters = self.cache_hits if event.hit else self.cache_misses
+        with self._lock:
+            counters[event.kind] = counters.get(event.kind, 0) + 1
+
+    def on_refresh(self, event):
+        with self._lock:
+            self.refreshes.setdefault(event.kind, Histogram(self.buckets)).observe(event.latency)
+
+    @staticmethod
+    def _describe(histogram):
+        return {
+            'count': histogram.count,
+            'mean': histogram.mean,
+            'p50': histogram.quantile(0.5),
+            'p99': histogram.quantile(0.99),
+        }
+
+    def summary(self):
+        """
+        Per endpoint and per resource type statistics; quantiles are bucket upper bounds
+
+        :rtype: dict
+        """
+        with self._lock:
+            requests = {}
+            for key, histogram in self.requests.items():
+                stats = self._describe(histogram)
+                stats.update(bytes=self.bytes.get(key, 0), retries=self.retries.get(key, 0),
+                             errors=self.errors.get(key, 0))
+                requests[' '.join(key)] = stats
+            return {
+                'requests': requests,
+                'refreshes': dict((kind, self._describe(histogram)) for kind, histogram in self.refreshes.items()),
+                'cache': dict((kind, {'hits': self.cache_hits.get(kind, 0), 'misses': self.cache_misses.get(kind, 0)})
+                              for kind in set(self.cache_hits) | set(self.cache_misses)),
+            }
+
+
+def notify(hooks, callback, event):
+    """
+    Passes ``event`` to the ``callback`` method of every hook.  A failing hook is logged, never raised.
+    """
+    for hook in hooks:
+        try:
+            getattr(hook, callback)(event)
+        except Exception as e:
+            logging.warn("Metrics hook {} failed in {}: {}".format(hook, callback, e))
@@ -0,0 +1,112 @@
+from cloudfoundry.exceptions import CloudFoundryException
+
+
+_interned = {}
+
+
+def intern_value(value):
+    """
+    Returns a canonical instance of a frequently repeated string (states, buildpacks, parent guids...), so that
+    thousands of models share one copy.  The builtin ``intern`` only accepts byte strings, while decoded JSON is
+    unicode.  Only use this for low-cardinality fields: the table is never pruned.
+    """
+    if isinstance(value, basestring):
+        return _interned.setdefault(value, value)
+    return value
+
+
+class CloudFoundryModel(object):
+    """
+    Compact base for the resource models.  Fields live in ``__slots__`` rather than a per-object ``__dict__``.
+    URLs that follow from the guids (``url``, ``routes_url``, ``space_url``...) are derived on access instead of
+    stored.  Fields the model does not know about go to an overflow dict allocated only when needed.
+
+    Models handed out by a CloudFoundryInterface are attached to it, which lets their relationship properties
+    (``app.space``, ``route.domain``...) resolve through its cached collections.
+    """
+
+    __slots__ = ('guid', '_extra', '_client')
+
+    # Collection name of the resource type in CloudFoundryInterface (apps, spaces...)
+    _kind = None
+
+    # URL attribute name -> (format string, name of the guid field to fill it with)
+    _urls = {}
+
+    @classmethod
+    def get_class_name(cls):
+        return cls.__name__
+
+    def __init__(self, metadata, extra=None):
+        self.guid = metadata['guid']
+        self._extra = None
+        self._client = None
+        for key, value in (extra or {}).items():
+            self._set_extra(key, value)
+
+    def _set_extra(self, key, value):
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def _derive_url(self, name):
+        template, field = self._urls[name]
+        guid = getattr(self, field)
+        if guid is None:
+            return None
+        return template.format(guid)
+
+    def _check_urls(self, **urls):
+        """
+        Drops URLs that can be derived again from the guids, keeping only the ones that differ
+        """
+        for name, value in urls.items():
+            if value and value != self._derive_url(name):
+                self._set_extra(name, value)
+
+    def _related(self, relation):
+        if self._client is None:
+            raise CloudFoundryException("{} {} is not attached to a CloudFoundryInterface".format(
+                self.get_class_name(), self.guid))
+        return self._client._resolve_relation(self, relation)
+
+    def __getattr__(self, name):
+        # Only reached when regular lookup fails: derived URLs and overflow fields
+        if name in ('_extra', '_client'):
+            raise AttributeError(name)
+        extra = self._extra
+        if extra is not None and name in extra:
+            return extra[name]
+        if name in self._urls:
+            return self._derive_url(name)
+        raise AttributeError("'{}' object has no attribute '{}'".format(self.get_class_name(), name))
+
+    @classmethod
+    def _slot_names(cls):
+        names = []
+        for klass in reversed(cls.__mro__):
+            names.extend(slot for slot in getattr(klass, '__slots__', ()) if slot not in ('_extra', '_client'))
+        return names
+
+    def _fields(self):
+        fields = dict((name, getattr(self, name, None)) for name in self._slot_names())
+        fields.update((name, getattr(self, name)) for name in self._urls)
+        fields.update(self._extra or {})
+        return fields
+
+    def __getstate__(self):
+        return dict((name, getattr(self, name)) for name in self._slot_names() + ['_extra'] if hasattr(self, name))
+
+    def __setstate__(self, state):
+        self._extra = None
+        self._client = None
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def __str__(self):
+        # to show include all variables in sorted order
+        fields = self._fields()
+        return "<{}>@0x{}:\n".format(self.get_class_name(),id(self)) + "\n".join(["  %s: %s" % (key.rjust(16), fields[key]) for key in sorted(fields)])
+
+    def __repr__(self):
+        return self.__str__()
@@ -2,19 +2,32 @@ __author__ = 'mcowger'
 
 import logging
 from pprint import pformat, pprint
+from cloudfoundry.models import CloudFoundryModel, intern_value
 
-class CloudFoundryOrg(object):
+class CloudFoundryOrg(CloudFoundryModel):
 
-    @classmethod
-    def get_class_name(cls):
-        return cls.__name__
+    _kind = 'orgs'
 
-    def __str__(self):
-        # to show include all variables in sorted order
-        return "<{}>@0x{}:\n".format(self.get_class_name(),id(self)) + "\n".join(["  %s: %s" % (key.rjust(16), self.__dict__[key]) for key in sorted(set(self.__dict__))])
+    __slots__ = (
+        '_name',
+        'billing_enabled',
+        'quota_definition_guid',
+        'status',
+    )
 
-    def __repr__(self):
-        return self.__str__()
+    _urls = {
+        'url': ('/v2/organizations/{}', 'guid'),
+        'quota_definition_url': ('/v2/quota_definitions/{}', 'quota_definition_guid'),
+        'spaces_url': ('/v2/organizations/{}/spaces', 'guid'),
+        'domains_url': ('/v2/organizations/{}/domains', 'guid'),
+        'private_domains_url': ('/v2/organizations/{}/private_domains', 'guid'),
+        'users_url': ('/v2/organizations/{}/users', 'guid'),
+        'managers_url': ('/v2/organizations/{}/managers', 'guid'),
+        'billing_managers_url': ('/v2/organizations/{}/billing_managers', 'guid'),
+        'auditors_url': ('/v2/organizations/{}/auditors', 'guid'),
+        'app_events_url': ('/v2/organizations/{}/app_events', 'guid'),
+        'space_quota_definitions_url': ('/v2/organizations/{}/space_quota_definitions', 'guid'),
+    }
 
     def __init__(
         self,
@@ -34,24 +47,27 @@ class CloudFoundryOrg(object):
         auditors_url=None,
         app_events_url=None,
         space_quota_definitions_url=None,
-        metadata=None
+        metadata=None,
+        **kwargs
     ):
+        CloudFoundryModel.__init__(self, metadata, kwargs)
         self._name = name
         self.billing_enabled=billing_enabled
-        self.quota_definition_guid=quota_definition_guid
-        self.status=status
-        self.quota_definition_url=quota_definition_url
-        self.spaces_url=spaces_url
-        self.domains_url=domains_url
-        self.private_domains_url=private_domains_url
-        self.users_url=users_url
-        self.managers_url=managers_url
-        self.billing_managers_url=billing_managers_url
-        self.auditors_url=auditors_url
-        self.app_events_url=app_events_url
-        self.space_quota_definitions_url=space_quota_definitions_url
-        self.guid = metadata['guid']
-        self.url = metadata['url']
+        self.quota_definition_guid=intern_value(quota_definition_guid)
+        self.status=intern_value(status)
+        self._check_urls(
+            url=metadata['url'],
+            quota_definition_url=quota_definition_url,
+            spaces_url=spaces_url,
+            domains_url=domains_url,
+            private_domains_url=private_domains_url,
+            users_url=users_url,
+            managers_url=managers_url,
+            billing_managers_url=billing_managers_url,
+            auditors_url=auditors_url,
+            app_events_url=app_events_url,
+            space_quota_definitions_url=space_quota_definitions_url,
+        )
 
 
 
@@ -59,7 +75,13 @@ class CloudFoundryOrg(object):
     def name(self):
         return self._name
 
+    @property
+    def spaces(self):
+        """
+        The CloudFoundrySpaces in the organization
+        """
+        return self._related('spaces')
+
     @staticmethod
     def from_dict(metadata, dict):
         return CloudFoundryOrg(metadata=metadata, **dict)
-
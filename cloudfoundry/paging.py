@@ -0,0 +1,107 @@
+import logging
+from multiprocessing.pool import ThreadPool
+from urllib import urlencode
+from urlparse import urlparse, urlunparse, parse_qsl
+
+
+DEFAULT_RESULTS_PER_PAGE = 100
+DEFAULT_MAX_WORKERS = 8
+
+
+def page_url(url, page, results_per_page=None):
+    """
+    Rewrites the paging parameters of a v2 listing URL, keeping every other query parameter (e.g. ``q``) intact
+
+    :param url: The listing URL, relative or absolute
+    :type url: str
+    :param page: The 1-based page number to request
+    :type page: int
+    :param results_per_page: Page size to request, or None to leave it unchanged
+    :type results_per_page: int
+    :rtype: str
+    """
+    parts = urlparse(url)
+    params = parse_qsl(parts.query, keep_blank_values=True)
+    if results_per_page is None:
+        results_per_page = dict(params).get('results-per-page')
+    params = [(k, v) for k, v in params if k not in ('page', 'results-per-page')]
+    params.append(('page', page))
+    if results_per_page is not None:
+        params.append(('results-per-page', results_per_page))
+    return urlunparse(parts._replace(query=urlencode(params)))
+
+
+class Paginator(object):
+    """
+    Walks a paginated v2 listing.  The first page is fetched on its own to learn ``total_pages``, the remaining
+    pages are then fetched concurrently on a bounded pool of worker threads and handed back in page order.
+    """
+
+    def __init__(self, fetch, max_workers=DEFAULT_MAX_WORKERS, results_per_page=DEFAULT_RESULTS_PER_PAGE):
+        """
+        :param fetch: Callable taking a URL and returning the decoded JSON page
+        :type fetch: callable
+        :param max_workers: Upper bound on the number of pages in flight at once
+        :type max_workers: int
+        :param results_per_page: Page size to request (the v2 API caps this at 100)
+        :type results_per_page: int
+        """
+        self._fetch = fetch
+        self.max_workers = max_workers
+        self.results_per_page = results_per_page
+
+    def pages(self, url, first=None):
+        """
+        Generator over every page of the listing at ``url``, in order
+
+        :param first: The already fetched first page of ``url``, if any.  Later pages then keep the page size of ``url``
+        :type first: dict
+        """
+        results_per_page = self.results_per_page
+        if first is None:
+            first = self._fetch(page_url(url, 1, results_per_page))
+        else:
+            results_per_page = None
+        yield first
+
+        total_pages = first.get('total_pages')
+        if total_pages is None:
+            # Not a counted listing, fall back to following next_url
+            page = first
+            while page.get('next_url'):
+                page = self._fetch(page['next_url'])
+                yield page
+            return
+
+        urls = [page_url(url, number, results_per_page) for number in range(2, total_pages + 1)]
+        if not urls:
+            return
+
+        logging.debug("Fetching {} remaining pages of {} with {} workers".format(len(urls), url, self.max_workers))
+        if self.max_workers <= 1:
+            for next_url in urls:
+                yield self._fetch(next_url)
+            return
+
+        pool = ThreadPool(min(self.max_workers, len(urls)))
+        try:
+            for page in pool.imap(self._fetch, urls):
+                yield page
+        finally:
+            pool.terminate()
+
+    def iter_resources(self, url):
+        """
+        Generator over every resource of the listing at ``url``
+        """
+        for page in self.pages(url):
+            for resource in page.get('resources', []):
+                yield resource
+
+    def all_resources(self, url):
+        """
+        Every resource of the listing at ``url``, collected into a list
+
+        :rtype: list
+        """
+        return list(self.iter_resources(url))
@@ -0,0 +1,162 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from cloudfoundry.exceptions import CloudFoundryException
+
+
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_MAX_POLL_INTERVAL = 15.0
+DEFAULT_POLL_BACKOFF = 1.5
+DEFAULT_WAIT_TIMEOUT = 600
+
+
+class PollHandle(object):
+    """
+    The pending outcome of something polled by a Poller: an upload job, an app staging or starting...  Call
+    ``result()`` to wait for it.
+    """
+
+    def __init__(self, check, interval, max_interval, backoff, timeout, description):
+        self.description = description
+        self._check = check
+        self._interval = interval
+        self._max_interval = max_interval
+        self._backoff = backoff
+        self._deadline = time.time() + timeout if timeout is not None else None
+        self._event = threading.Event()
+        self._value = None
+        self._error = None
+        self.polls = 0
+
+    def done(self):
+        return self._event.is_set()
+
+    def result(self, timeout=None):
+        """
+        Waits for the outcome and returns it, or raises the error that ended polling
+
+        :param timeout: Seconds to wait, None to wait until polling ends
+        :type timeout: float
+        """
+        if not self._event.wait(timeout):
+            raise CloudFoundryException("Still waiting for {} after {}s".format(self.description, timeout))
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    def cancel(self):
+        """
+        Stops polling; ``result()`` then raises
+        """
+        self._finish(error=CloudFoundryException("Stopped waiting for {}".format(self.description)))
+
+    def _finish(self, value=None, error=None):
+        if self._event.is_set():
+            return
+        self._value = value
+        self._error = error
+        self._event.set()
+
+    def _poll(self):
+        """
+        Runs one check
+
+        :return: When to check next, or None once finished
+        """
+        self.polls += 1
+        try:
+            finished, value = self._check()
+        except Exception as e:
+            self._finish(error=e)
+            return None
+        if finished:
+            self._finish(value)
+            return None
+        now = time.time()
+        if self._deadline is not None and now >= self._deadline:
+            self._finish(error=CloudFoundryException("Timed out waiting for {}".format(self.description)))
+            return None
+        self._interval = min(self._interval * self._backoff, self._max_interval)
+        return now + self._interval
+
+
+class Poller(object):
+    """
+    Polls any number of pending operations from a single background thread, each at its own backing-off interval,
+    so that many deploys can wait at once without a thread (or a busy loop) each.  Checks run one after another on
+    that thread and should be single, quick requests.  The thread stops once nothing is left to poll.
+    """
+
+    def __init__(self, name="cloudfoundry-poller"):
+        """
+        :param name: Name of the polling thread
+        :type name: str
+        """
+        self.name = name
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def submit(self, check, description, interval=DEFAULT_POLL_INTERVAL, max_interval=DEFAULT_MAX_POLL_INTERVAL,
+               backoff=DEFAULT_POLL_BACKOFF, timeout=DEFAULT_WAIT_TIMEOUT, delay=None):
+        """
+        Starts polling ``check`` after ``delay`` seconds (``interval`` by default), then at intervals growing by ``backoff`` up to
+        ``max_interval``, until it reports completion, raises, or ``timeout`` seconds pass
+
+        :param check: Callable returning a (finished, value) pair
+        :param description: What is being waited for, used in errors
+        :type description: str
+        :rtype: PollHandle
+        """
+        handle = PollHandle(check, interval, max_interval, backoff, timeout, description)
+        self._schedule(handle, time.time() + (interval if delay is None else delay))
+        return handle
+
+    def _schedule(self, handle, when):
+        with self._condition:
+            heapq.heappush(self._queue, (when, next(self._sequence), handle))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name)
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._queue:
+                    self._thread = None
+                    return
+                when, _, handle = self._queue[0]
+                delay = when - time.time()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                heapq.heappop(self._queue)
+            if handle.done():
+                continue
+            try:
+                when = handle._poll()
+            except Exception as e:
+                logging.warn("Polling {} failed: {}".format(handle.description, e))
+                continue
+            if when is not None:
+                self._schedule(handle, when)
+
+
+_default_poller = None
+_default_poller_lock = threading.Lock()
+
+
+def default_poller():
+    """
+    The poller shared by every interface in the process
+    """
+    global _default_poller
+    with _default_poller_lock:
+        if _default_poller is None:
+            _default_poller = Poller()
+        return _default_poller
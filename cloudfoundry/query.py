@@ -0,0 +1,56 @@
+from urllib import urlencode
+
+
+ORDER_DIRECTIONS = ('asc', 'desc')
+
+
+def format_filter(field, value, operator=None):
+    """
+    Builds a single v2 ``q`` filter.  List and tuple values become an ``IN`` filter.
+
+    >>> format_filter('name', 'foo')
+    'name:foo'
+    >>> format_filter('host', ['a', 'b'])
+    'host IN a,b'
+
+    :param field: The field to filter on (e.g. name, space_guid, host)
+    :type field: str
+    :param value: The value (or values) to match
+    :param operator: Explicit operator (e.g. '>=' or ' IN '), defaults to ':' or ' IN ' depending on ``value``
+    :type operator: str
+    :rtype: str
+    """
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return u"{}{}{}".format(field, operator or ' IN ', ','.join(value))
+    return u"{}{}{}".format(field, operator or ':', value)
+
+
+def query_url(path, filters=None, results_per_page=None, order_direction=None, params=None):
+    """
+    Builds a filtered v2 listing URL
+
+    :param path: The listing path (e.g. v2/apps)
+    :type path: str
+    :param filters: Either ready-made ``q`` strings (e.g. ``['name:foo']``) or a dict of field to value
+    :type filters: list or dict
+    :param results_per_page: Page size, at most 100
+    :type results_per_page: int
+    :param order_direction: 'asc' or 'desc'
+    :type order_direction: str
+    :param params: Any further query parameters (e.g. inline-relations-depth)
+    :type params: dict
+    :rtype: str
+    """
+    if isinstance(filters, dict):
+        filters = [format_filter(field, value) for field, value in sorted(filters.items())]
+    extra_params = sorted((params or {}).items())
+    params = [('q', q.encode('utf-8')) for q in (filters or [])]
+    params.extend(extra_params)
+    if results_per_page is not None:
+        params.append(('results-per-page', results_per_page))
+    if order_direction is not None:
+        assert order_direction in ORDER_DIRECTIONS
+        params.append(('order-direction', order_direction))
+    if not params:
+        return path
+    return "{}?{}".format(path, urlencode(params))
@@ -0,0 +1,26 @@
+# Relations resolved through a guid field: (kind, relation) -> (related kind, guid field)
+TO_ONE = {
+    ('apps', 'space'): ('spaces', 'space_guid'),
+    ('spaces', 'organization'): ('orgs', 'organization_guid'),
+    ('routes', 'domain'): ('domains', 'domain_guid'),
+    ('routes', 'space'): ('spaces', 'space_guid'),
+    ('domains', 'owning_organization'): ('orgs', 'owning_organization_guid'),
+}
+
+# Relations resolved through a listing URL: (kind, relation) -> (related kind, url field)
+TO_MANY = {
+    ('apps', 'routes'): ('routes', 'routes_url'),
+    ('routes', 'apps'): ('apps', 'apps_url'),
+    ('spaces', 'apps'): ('apps', 'apps_url'),
+    ('spaces', 'routes'): ('routes', 'routes_url'),
+    ('orgs', 'spaces'): ('spaces', 'spaces_url'),
+}
+
+# Number of guids per 'guid IN ...' filter, keeping request URLs to a sensible length
+GUID_BATCH_SIZE = 50
+
+
+def batches(items, size=GUID_BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
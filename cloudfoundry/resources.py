@@ -0,0 +1,162 @@
+import copy
+import threading
+from collections import MutableMapping
+from cloudfoundry.indexes import ResourceIndex
+
+
+def build_model(model, record, client=None):
+    """
+    Builds the model object of a raw resource record, attached to ``client``.  Records are shared with the response
+    cache, the snapshots and later refreshes, so the model gets its own copies of dict and list values (such as
+    ``environment_json``) and changing them does not change the record.
+    """
+    entity = dict((key, copy.deepcopy(value) if isinstance(value, (dict, list)) else value)
+                  for key, value in record['entity'].iteritems())
+    obj = model.from_dict(dict(record['metadata']), entity)
+    obj._client = client
+    return obj
+
+
+class ResourceCollection(MutableMapping):
+    """
+    A guid -> model mapping that keeps the raw v2 resource records and only builds model objects when they are
+    accessed, by guid or through an index lookup.  Iterating over guids, ``len()`` and ``in`` never build one, so
+    refreshing a large collection costs little more than decoding its JSON.
+
+    Collections are safe to share between threads: changes and index lookups hold a lock, and iteration runs over a
+    copy of the guids taken when it starts.
+    """
+
+    def __init__(self, model, indexes, resources=(), client=None):
+        """
+        :param model: The model class, with a ``from_dict(metadata, entity)`` constructor
+        :type model: type
+        :param indexes: Index definitions, as taken by ResourceIndex
+        :type indexes: dict
+        :param resources: Raw resource records to start with
+        :type resources: iterable
+        :param client: The CloudFoundryInterface the models are attached to
+        :type client: CloudFoundryInterface
+        """
+        self.model = model
+        self.client = client
+        self._indexes = indexes
+        self._records = {}
+        self._objects = {}
+        self._index = ResourceIndex(indexes)
+        self._lock = threading.RLock()
+        for resource in resources:
+            self.put(resource)
+
+    def _indexed(self, guid):
+        # What the index was built from: the record if there is one, the object otherwise
+        record = self._records[guid]
+        return record if record is not None else self._objects[guid]
+
+    def put(self, resource):
+        """
+        Adds or replaces a resource from its raw record, without building its model object
+        """
+        guid = resource['metadata']['guid']
+        with self._lock:
+            if guid in self._records:
+                self._index.discard(self._indexed(guid))
+            self._records[guid] = resource
+            self._objects.pop(guid, None)
+            self._index.add(resource)
+
+    def copy(self):
+        """
+        A new collection holding the same records and model objects, which can be changed without affecting this one
+
+        :rtype: ResourceCollection
+        """
+        with self._lock:
+            other = ResourceCollection(self.model, self._indexes, client=self.client)
+            other._records = dict(self._records)
+            other._objects = dict(self._objects)
+        for guid in other._records:
+            other._index.add(other._indexed(guid))
+        return other
+
+    def holds(self, resources):
+        """
+        Whether the collection consists of exactly these raw record objects (the same objects, not equal copies)
+
+        :type resources: list
+        """
+        with self._lock:
+            if len(resources) != len(self._records):
+                return False
+            return all(self._records.get(resource['metadata']['guid']) is resource for resource in resources)
+
+    def records(self):
+        """
+        (guid, raw record) pairs of every resource, taken at once so that concurrent changes cannot interleave.  The
+        record is None for resources added as model objects.
+
+        :rtype: list
+        """
+        with self._lock:
+            return self._records.items()
+
+    def record(self, guid):
+        """
+        The raw record of a resource, or None if it was added as a model object
+        """
+        return self._records[guid]
+
+    def __getitem__(self, guid):
+        obj = self._objects.get(guid)
+        if obj is None:
+            with self._lock:
+                obj = self._objects.get(guid)
+                if obj is None:
+                    # Read under the lock, or a record replaced meanwhile could be cached as the object
+                    record = self._records[guid]
+                    obj = self._objects[guid] = build_model(self.model, record, self.client)
+        return obj
+
+    def __setitem__(self, guid, obj):
+        with self._lock:
+            if guid in self._records:
+                self._index.discard(self._indexed(guid))
+            self._records[guid] = None
+            self._objects[guid] = obj
+            self._index.add(obj)
+
+    def __delitem__(self, guid):
+        with self._lock:
+            indexed = self._indexed(guid)
+            del self._records[guid]
+            self._objects.pop(guid, None)
+            self._index.discard(indexed)
+
+    def __contains__(self, guid):
+        return guid in self._records
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._records))
+
+    def __len__(self):
+        return len(self._records)
+
+    def find(self, index, *key):
+        """
+        All resources whose ``index`` key matches, as model objects
+
+        :rtype: list
+        """
+        with self._lock:
+            return [self[guid] for guid in self._index.find(index, *key)]
+
+    def first(self, index, *key):
+        """
+        The first resource whose ``index`` key matches, or None
+        """
+        with self._lock:
+            guids = self._index.find(index, *key)
+            if guids:
+                return self[guids[0]]
+        return None
@@ -0,0 +1,138 @@
+import email.utils
+import logging
+import random
+import threading
+import time
+
+
+# Statuses worth another try: rate limited, or the Cloud Controller (or its router) briefly unavailable
+RETRY_STATUSES = (429, 502, 503, 504)
+# Methods that can safely be sent twice
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+
+def _header_delay(response):
+    """
+    Seconds the server asked us to wait, from ``Retry-After`` (delta seconds or HTTP date) or an exhausted
+    ``X-RateLimit-Remaining`` with its ``X-RateLimit-Reset`` epoch time, or None
+    """
+    headers = response.headers
+    retry_after = headers.get('Retry-After')
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            parsed = email.utils.parsedate_tz(retry_after)
+            if parsed is not None:
+                return max(0.0, email.utils.mktime_tz(parsed) - time.time())
+    if headers.get('X-RateLimit-Remaining') == '0' and headers.get('X-RateLimit-Reset'):
+        try:
+            return max(0.0, float(headers['X-RateLimit-Reset']) - time.time())
+        except ValueError:
+            pass
+    return None
+
+
+class RetryPolicy(object):
+    """
+    When and how long to wait before resending a failed request.  Waits grow exponentially with "full jitter"
+    (a random delay up to the exponential bound) so that many clients backing off at once spread out, unless the
+    server says how long to wait through ``Retry-After`` or ``X-RateLimit-*`` headers.
+    """
+
+    def __init__(self, max_retries=5, backoff_factor=0.5, max_backoff=60, statuses=RETRY_STATUSES,
+                 methods=IDEMPOTENT_METHODS):
+        """
+        :param max_retries: Resends allowed per request, 0 to never retry
+        :type max_retries: int
+        :param backoff_factor: Bound in seconds of the first wait, doubling on each retry
+        :type backoff_factor: float
+        :param max_backoff: Upper bound in seconds of any wait, including server-requested ones
+        :type max_backoff: float
+        :param statuses: Response statuses to retry
+        :type statuses: tuple
+        :param methods: Methods retried after a server error or a failed connection.  A 429 is retried for any
+            method since the request was refused rather than processed.
+        :type methods: tuple
+        """
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+        self.methods = methods
+
+    def should_retry(self, method, attempt, response=None):
+        """
+        :param method: The HTTP method
+        :param attempt: Number of retries already made
+        :param response: The failed response, or None if the request raised a connection error
+        """
+        if attempt >= self.max_retries:
+            return False
+        if response is None:
+            return method in self.methods
+        if response.status_code == 429:
+            return True
+        return response.status_code in self.statuses and method in self.methods
+
+    def delay(self, attempt, response=None):
+        """
+        Seconds to wait before retry number ``attempt`` (counting from 0)
+        """
+        if response is not None:
+            requested = _header_delay(response)
+            if requested is not None:
+                return min(requested, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+
+
+class TokenBucket(object):
+    """
+    Client-side rate limiter: requests take a token each, tokens refill at ``rate`` per second and at most ``burst``
+    accumulate.  Share one between interfaces to keep their combined rate under the foundation's limit.  When a
+    response reports the server-side limit exhausted, everyone waits for its reset.
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        :param rate: Sustained requests per second
+        :type rate: float
+        :param burst: Requests allowed back to back after an idle period, defaults to ``rate``
+        :type burst: float
+        """
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1, rate))
+        self._tokens = self.burst
+        self._updated = time.time()
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a request may be sent
+        """
+        while True:
+            with self._lock:
+                now = time.time()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def observe(self, response):
+        """
+        Pauses the bucket until the server-side limit resets, if ``response`` reports it exhausted
+        """
+        if response.headers.get('X-RateLimit-Remaining') != '0':
+            return
+        delay = _header_delay(response)
+        if delay:
+            with self._lock:
+                self._paused_until = max(self._paused_until, time.time() + delay)
+            logging.warn("API rate limit exhausted, pausing requests for {:.1f}s".format(delay))
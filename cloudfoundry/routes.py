@@ -2,19 +2,24 @@ __author__ = 'mcowger'
 
 import logging
 from pprint import pformat, pprint
+from cloudfoundry.models import CloudFoundryModel, intern_value
 
-class CloudFoundryRoute(object):
+class CloudFoundryRoute(CloudFoundryModel):
 
-    @classmethod
-    def get_class_name(cls):
-        return cls.__name__
+    _kind = 'routes'
 
-    def __str__(self):
-        # to show include all variables in sorted order
-        return "<{}>@0x{}:\n".format(self.get_class_name(),id(self)) + "\n".join(["  %s: %s" % (key.rjust(16), self.__dict__[key]) for key in sorted(set(self.__dict__))])
+    __slots__ = (
+        'host',
+        'domain_guid',
+        'space_guid',
+    )
 
-    def __repr__(self):
-        return self.__str__()
+    _urls = {
+        'url': ('/v2/routes/{}', 'guid'),
+        'domain_url': ('/v2/domains/{}', 'domain_guid'),
+        'space_url': ('/v2/spaces/{}', 'space_guid'),
+        'apps_url': ('/v2/routes/{}/apps', 'guid'),
+    }
 
     def __init__(
         self,
@@ -26,16 +31,19 @@ class CloudFoundryRoute(object):
         domain_url=None,
         space_url=None,
         apps_url=None,
-        metadata=None
+        metadata=None,
+        **kwargs
     ):
+        CloudFoundryModel.__init__(self, metadata, kwargs)
         self.host=host
-        self.domain_guid=domain_guid
-        self.space_guid=space_guid
-        self.domain_url=domain_url
-        self.space_url=space_url
-        self.apps_url=apps_url
-        self.guid = metadata['guid']
-        self.url = metadata['url']
+        self.domain_guid=intern_value(domain_guid)
+        self.space_guid=intern_value(space_guid)
+        self._check_urls(
+            url=metadata['url'],
+            domain_url=domain_url,
+            space_url=space_url,
+            apps_url=apps_url,
+        )
 
 
 
@@ -43,6 +51,27 @@ class CloudFoundryRoute(object):
     def name(self):
         return self.host
 
+    @property
+    def domain(self):
+        """
+        The CloudFoundryDomain of the route
+        """
+        return self._related('domain')
+
+    @property
+    def space(self):
+        """
+        The CloudFoundrySpace the route belongs to
+        """
+        return self._related('space')
+
+    @property
+    def apps(self):
+        """
+        The CloudFoundryApps the route is mapped to
+        """
+        return self._related('apps')
+
     @staticmethod
     def from_dict(metadata, dict):
         return CloudFoundryRoute(metadata=metadata, **dict)
@@ -0,0 +1,50 @@
+import threading
+
+
+class _Call(object):
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls: while a call for a key is in flight, further callers with the same key wait for it
+    and share its result (or its exception) instead of making their own
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Calls ``func(*args, **kwargs)``, unless a call for ``key`` is already running, in which case its outcome is
+        returned once it completes
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = func(*args, **kwargs)
+            return call.value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def in_flight(self, key):
+        return key in self._calls
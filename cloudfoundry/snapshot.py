@@ -0,0 +1,99 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import zlib
+from collections import namedtuple
+
+
+# How old a snapshot may be and still be served while it is revalidated, in seconds
+DEFAULT_MAX_STALENESS = 300
+
+
+class Snapshot(namedtuple('Snapshot', 'fetched_at high_water resources listed_at')):
+    """
+    A persisted collection: when it was fetched, its high-water mark (or None), its raw resource records and when
+    they were last listed in full rather than synced incrementally (or None)
+    """
+    __slots__ = ()
+
+
+class SnapshotStore(object):
+    """
+    Keeps fetched collections in a SQLite file so that a new CloudFoundryInterface can start from the last fetch
+    instead of downloading everything again.  Each snapshot holds the raw resource records as zlib-compressed JSON,
+    along with the time they were fetched.  Snapshots are keyed by cache namespace (target and user) and resource
+    type, so one file can serve several interfaces and processes.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: The SQLite database file, created if missing
+        :type path: str
+        """
+        self.path = os.path.expanduser(path)
+        self._lock = threading.Lock()
+        self._execute("CREATE TABLE IF NOT EXISTS snapshots ("
+                      "namespace TEXT NOT NULL, kind TEXT NOT NULL, fetched_at REAL NOT NULL, high_water TEXT, "
+                      "data BLOB NOT NULL, listed_at REAL, PRIMARY KEY (namespace, kind))")
+        try:
+            self._execute("ALTER TABLE snapshots ADD COLUMN listed_at REAL")
+        except sqlite3.OperationalError:
+            # Already there
+            pass
+
+    def _execute(self, sql, params=()):
+        # One short-lived connection per statement: sqlite3 connections may not cross threads
+        with self._lock:
+            db = sqlite3.connect(self.path, timeout=30)
+            try:
+                with db:
+                    return db.execute(sql, params).fetchall()
+            finally:
+                db.close()
+
+    def load(self, namespace, kind):
+        """
+        The snapshot of ``kind``, or None if there is no readable one
+
+        :rtype: Snapshot
+        """
+        rows = self._execute("SELECT fetched_at, high_water, data, listed_at FROM snapshots "
+                             "WHERE namespace = ? AND kind = ?", (namespace, kind))
+        if not rows:
+            return None
+        fetched_at, high_water, data, listed_at = rows[0]
+        try:
+            resources = json.loads(zlib.decompress(data))
+        except (zlib.error, ValueError):
+            logging.warn("Ignoring unreadable {} snapshot in {}".format(kind, self.path))
+            return None
+        return Snapshot(fetched_at, high_water, resources, listed_at)
+
+    def save(self, namespace, kind, resources, fetched_at, high_water=None, listed_at=None):
+        """
+        :param resources: Raw resource records
+        :type resources: list
+        :param fetched_at: When the records were fetched, as a Unix timestamp
+        :type fetched_at: float
+        :param high_water: The newest resource timestamp among the records, used to sync them incrementally
+        :type high_water: str
+        :param listed_at: When the records were last listed in full, as a Unix timestamp
+        :type listed_at: float
+        """
+        data = zlib.compress(json.dumps(resources, separators=(',', ':')))
+        self._execute("INSERT OR REPLACE INTO snapshots (namespace, kind, fetched_at, high_water, data, listed_at) "
+                      "VALUES (?, ?, ?, ?, ?, ?)",
+                      (namespace, kind, fetched_at, high_water, sqlite3.Binary(data), listed_at))
+        logging.debug("Saved {} {} to snapshot ({} bytes)".format(len(resources), kind, len(data)))
+
+    def touch(self, namespace, kind, fetched_at, high_water=None, listed_at=None):
+        """
+        Records that the snapshot of ``kind`` still matched the API at ``fetched_at``, without rewriting its records
+        """
+        self._execute("UPDATE snapshots SET fetched_at = ?, high_water = ?, listed_at = ? "
+                      "WHERE namespace = ? AND kind = ?", (fetched_at, high_water, listed_at, namespace, kind))
+
+    def delete(self, namespace, kind):
+        self._execute("DELETE FROM snapshots WHERE namespace = ? AND kind = ?", (namespace, kind))
@@ -2,19 +2,32 @@ __author__ = 'mcowger'
 
 import logging
 from pprint import pformat, pprint
+from cloudfoundry.models import CloudFoundryModel, intern_value
 
-class CloudFoundrySpace(object):
+class CloudFoundrySpace(CloudFoundryModel):
 
-    @classmethod
-    def get_class_name(cls):
-        return cls.__name__
+    _kind = 'spaces'
 
-    def __str__(self):
-        # to show include all variables in sorted order
-        return "<{}>@0x{}:\n".format(self.get_class_name(),id(self)) + "\n".join(["  %s: %s" % (key.rjust(16), self.__dict__[key]) for key in sorted(set(self.__dict__))])
+    __slots__ = (
+        '_name',
+        'organization_guid',
+        'space_quota_definition_guid',
+    )
 
-    def __repr__(self):
-        return self.__str__()
+    _urls = {
+        'url': ('/v2/spaces/{}', 'guid'),
+        'organization_url': ('/v2/organizations/{}', 'organization_guid'),
+        'developers_url': ('/v2/spaces/{}/developers', 'guid'),
+        'managers_url': ('/v2/spaces/{}/managers', 'guid'),
+        'auditors_url': ('/v2/spaces/{}/auditors', 'guid'),
+        'apps_url': ('/v2/spaces/{}/apps', 'guid'),
+        'routes_url': ('/v2/spaces/{}/routes', 'guid'),
+        'domains_url': ('/v2/spaces/{}/domains', 'guid'),
+        'service_instances_url': ('/v2/spaces/{}/service_instances', 'guid'),
+        'app_events_url': ('/v2/spaces/{}/app_events', 'guid'),
+        'events_url': ('/v2/spaces/{}/events', 'guid'),
+        'security_groups_url': ('/v2/spaces/{}/security_groups', 'guid'),
+    }
 
     def __init__(
         self,
@@ -34,24 +47,27 @@ class CloudFoundrySpace(object):
         app_events_url=None,
         events_url=None,
         security_groups_url=None,
-        metadata=None
+        metadata=None,
+        **kwargs
     ):
+        CloudFoundryModel.__init__(self, metadata, kwargs)
         self._name = name
-        self.organization_guid=organization_guid
-        self.space_quota_definition_guid=space_quota_definition_guid
-        self.organization_url=organization_url
-        self.developers_url=developers_url
-        self.managers_url=managers_url
-        self.auditors_url=auditors_url
-        self.apps_url=apps_url
-        self.routes_url=routes_url
-        self.domains_url=domains_url
-        self.service_instances_url=service_instances_url
-        self.app_events_url=app_events_url
-        self.events_url=events_url
-        self.security_groups_url=security_groups_url
-        self.guid = metadata['guid']
-        self.url = metadata['url']
+        self.organization_guid=intern_value(organization_guid)
+        self.space_quota_definition_guid=intern_value(space_quota_definition_guid)
+        self._check_urls(
+            url=metadata['url'],
+            organization_url=organization_url,
+            developers_url=developers_url,
+            managers_url=managers_url,
+            auditors_url=auditors_url,
+            apps_url=apps_url,
+            routes_url=routes_url,
+            domains_url=domains_url,
+            service_instances_url=service_instances_url,
+            app_events_url=app_events_url,
+            events_url=events_url,
+            security_groups_url=security_groups_url,
+        )
 
 
 
@@ -59,7 +75,27 @@ class CloudFoundrySpace(object):
     def name(self):
         return self._name
 
+    @property
+    def organization(self):
+        """
+        The CloudFoundryOrg the space belongs to
+        """
+        return self._related('organization')
+
+    @property
+    def apps(self):
+        """
+        The CloudFoundryApps in the space
+        """
+        return self._related('apps')
+
+    @property
+    def routes(self):
+        """
+        The CloudFoundryRoutes in the space
+        """
+        return self._related('routes')
+
     @staticmethod
     def from_dict(metadata, dict):
         return CloudFoundrySpace(metadata=metadata, **dict)
-
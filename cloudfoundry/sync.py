@@ -0,0 +1,59 @@
+import threading
+
+
+DELETE_EVENTS = {
+    'apps': 'audit.app.delete-request',
+    'routes': 'audit.route.delete-request',
+}
+# Incremental syncs only see deletions that leave a delete event, so collections are listed in full again this often,
+# in seconds
+DEFAULT_FULL_RESYNC_INTERVAL = 3600
+
+
+def resource_timestamp(resource):
+    """
+    When a raw v2 resource last changed.  ``updated_at`` is null until a resource is first modified, so fall back
+    to ``created_at``.  v2 timestamps are ISO 8601 in UTC and therefore compare correctly as strings.
+
+    :param resource: A raw resource, with ``metadata`` and ``entity``
+    :type resource: dict
+    :rtype: str
+    """
+    metadata = resource['metadata']
+    return metadata.get('updated_at') or metadata.get('created_at')
+
+
+class HighWaterMark(object):
+    """
+    Tracks the newest timestamp seen per resource type while resources stream past.  Marks only move forward while
+    resources are tracked, even if several listings of a type are tracked at once.
+    """
+
+    def __init__(self):
+        self._marks = {}
+        self._lock = threading.Lock()
+
+    def get(self, kind):
+        return self._marks.get(kind)
+
+    def set(self, kind, timestamp):
+        self._marks[kind] = timestamp
+
+    def reset(self, kind):
+        self._marks.pop(kind, None)
+
+    def track(self, kind, resources):
+        """
+        Passes ``resources`` through, raising the mark of ``kind`` to the newest timestamp among them
+        """
+        newest = None
+        for resource in resources:
+            timestamp = resource_timestamp(resource)
+            if timestamp is not None and (newest is None or timestamp > newest):
+                newest = timestamp
+            yield resource
+        if newest is not None:
+            with self._lock:
+                current = self._marks.get(kind)
+                if current is None or newest > current:
+                    self._marks[kind] = newest
@@ -0,0 +1,96 @@
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 32
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 120
+
+
+class Transport(object):
+    """
+    The pooled HTTP connection used for every call an interface makes, the API as well as UAA.  It holds no
+    credentials, so interfaces for different users of the same API can share one (see ``shared_transport``).
+    """
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT, keep_alive=True,
+                 gzip=True):
+        """
+        :param pool_connections: Number of hosts (API, UAA...) to keep a connection pool for
+        :type pool_connections: int
+        :param pool_maxsize: Connections kept open per host; size it to the number of concurrent requests
+        :type pool_maxsize: int
+        :param connect_timeout: Seconds to wait for a connection, or None to wait forever
+        :type connect_timeout: float
+        :param read_timeout: Seconds to wait for the server between bytes of the response, or None to wait forever
+        :type read_timeout: float
+        :param keep_alive: Reuse connections across requests
+        :type keep_alive: bool
+        :param gzip: Ask for compressed responses, which shrinks large listings considerably
+        :type gzip: bool
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout = (connect_timeout, read_timeout)
+        # The Cloud Controller only answers an upload once it has processed it, which takes as long as it takes
+        self.upload_timeout = (connect_timeout, None)
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate' if gzip else 'identity'
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+        self._lock = threading.Lock()
+        self._adapter = None
+        self._mount()
+
+    def _mount(self):
+        previous = self._adapter
+        self._adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        self.session.mount('https://', self._adapter)
+        self.session.mount('http://', self._adapter)
+        if previous is not None:
+            # Closes the idle connections; those in use are closed as they are released
+            previous.close()
+
+    def grow(self, pool_maxsize):
+        """
+        Raises the number of connections kept per host to at least ``pool_maxsize``.  This replaces the pool, so
+        open connections are not reused: prefer sizing the transport when creating it.
+        """
+        with self._lock:
+            if pool_maxsize > self.pool_maxsize:
+                self.pool_maxsize = pool_maxsize
+                self._mount()
+                logging.debug("Connection pool grown to {}".format(pool_maxsize))
+
+    def request(self, method, url, **kwargs):
+        """
+        Sends a request through the pool, with the transport's timeouts unless given others
+
+        :rtype: requests.Response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_transport(target, **settings):
+    """
+    The process-wide Transport for ``target``, created with ``settings`` (as taken by Transport) on first use.
+    Interfaces for the same API given this transport share its connections.
+
+    :param target: The CF API endpoint
+    :type target: str
+    :rtype: Transport
+    """
+    with _shared_lock:
+        transport = _shared.get(target)
+        if transport is None:
+            transport = _shared[target] = Transport(**settings)
+        return transport
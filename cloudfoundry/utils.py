@@ -1,20 +1,381 @@
 __author__ = 'mcowger'
 
+import hashlib
+import itertools
+import json
+import logging
 import zipfile
-import StringIO
+import zlib
+from collections import deque
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+import tempfile
+import threading
+import time
+import uuid
 import os
 
 
+DEFAULT_COMPRESSLEVEL = 6
+DEFAULT_SPILL_THRESHOLD = 64 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# The Cloud Controller's resource pool ignores smaller files, so there is no point fingerprinting them
+RESOURCE_MATCH_MIN_SIZE = 64 * 1024
+# Files above this size are streamed by the writer rather than compressed in memory by a worker
+PARALLEL_MAX_FILE_SIZE = 16 * 1024 * 1024
+# Files compressed ahead of the writer, per worker
+PARALLEL_WINDOW_PER_WORKER = 4
 
 
-
-def create_bits_zip(path):
-    buffer = StringIO.StringIO()
-    zip = zipfile.ZipFile(buffer,'w')
+def iter_bits(path):
+    """
+    Generator over the files of the application at ``path``, as (filename, arcname) pairs.  Arcnames always use
+    forward slashes, and files come in sorted order so identical trees always produce identical archives.
+    """
     for root, dirs, files in os.walk(path):
-        for file_obj in files:
+        dirs.sort()
+        for file_obj in sorted(files):
             arcname = "{}/{}".format(root,file_obj)
             relpath = os.path.relpath(arcname,path)
-            zip.write(os.path.join(root, file_obj),arcname=relpath)
-    zip.close()
-    return buffer
\ No newline at end of file
+            yield os.path.join(root, file_obj), relpath.replace(os.sep, '/')
+
+
+def file_mode(st):
+    """
+    The permission bits of a stat result, as the octal string the resource_match API uses (e.g. '644')
+    """
+    return '{:o}'.format(st.st_mode & 0o777)
+
+
+class FingerprintCache(object):
+    """
+    SHA1 digests of local files, keyed by (path, size, mtime) so unchanged files are never hashed twice.  Given a
+    ``path``, the cache is loaded from and saved to that JSON file and so survives across runs.  Only the latest
+    digest of each file is kept, and files that no longer exist are dropped when saving.
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: JSON file to persist fingerprints in, or None to keep them in memory only
+        :type path: str
+        """
+        self.path = os.path.expanduser(path) if path is not None else None
+        self._fingerprints = {}
+        # File path -> its key in _fingerprints
+        self._keys = {}
+        self._lock = threading.Lock()
+        if self.path is not None and os.path.exists(self.path):
+            try:
+                with open(self.path) as fp:
+                    self._fingerprints = json.load(fp)
+            except ValueError:
+                logging.warn("Ignoring unreadable fingerprint cache {}".format(self.path))
+        for key in self._fingerprints:
+            self._keys[self._filename(key)] = key
+
+    @staticmethod
+    def _key(filename, st):
+        return u"{}|{}|{}".format(os.path.abspath(filename), st.st_size, st.st_mtime)
+
+    @staticmethod
+    def _filename(key):
+        return key.rsplit(u'|', 2)[0]
+
+    def sha1(self, filename, st=None):
+        """
+        The hex SHA1 digest of ``filename``, hashing it only if it changed since it was last seen
+
+        :param st: The file's stat result, if already known
+        """
+        if st is None:
+            st = os.stat(filename)
+        key = self._key(filename, st)
+        digest = self._fingerprints.get(key)
+        if digest is None:
+            sha1 = hashlib.sha1()
+            with open(filename, 'rb') as fp:
+                for buf in iter(lambda: fp.read(CHUNK_SIZE), ''):
+                    sha1.update(buf)
+            digest = sha1.hexdigest()
+            with self._lock:
+                # The file changed since its previous digest, which can never match again
+                previous = self._keys.get(self._filename(key))
+                if previous is not None:
+                    self._fingerprints.pop(previous, None)
+                self._fingerprints[key] = digest
+                self._keys[self._filename(key)] = key
+        return digest
+
+    def sha1_many(self, files, workers=1):
+        """
+        Digests of several files, hashed on ``workers`` threads
+
+        :param files: (filename, stat result) pairs
+        :type files: list
+        :return: The digests, in the order of ``files``
+        :rtype: list
+        """
+        if workers <= 1 or len(files) <= 1:
+            return [self.sha1(filename, st) for filename, st in files]
+        pool = ThreadPool(min(workers, len(files)))
+        try:
+            return pool.map(lambda item: self.sha1(*item), files)
+        finally:
+            pool.terminate()
+
+    def save(self):
+        """
+        Writes the cache to its file, if it has one.  The file is replaced atomically, so an interrupted save leaves
+        the previous one intact.
+        """
+        if self.path is None:
+            return
+        with self._lock:
+            for filename, key in self._keys.items():
+                if not os.path.exists(filename):
+                    del self._keys[filename]
+                    self._fingerprints.pop(key, None)
+            fingerprints = dict(self._fingerprints)
+        fd, tmp_path = tempfile.mkstemp(prefix='.fingerprints', dir=os.path.dirname(os.path.abspath(self.path)))
+        try:
+            with os.fdopen(fd, 'w') as fp:
+                json.dump(fingerprints, fp)
+            if os.name == 'nt' and os.path.exists(self.path):
+                # Windows cannot rename over an existing file
+                os.remove(self.path)
+            os.rename(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def _zipinfo(zip_file, arcname, st):
+    zinfo = zipfile.ZipInfo(arcname, time.localtime(st.st_mtime)[0:6])
+    zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.file_size = st.st_size
+    zinfo.flag_bits = 0x00
+    zinfo.header_offset = zip_file.fp.tell()
+    zip_file._writecheck(zinfo)
+    zip_file._didModify = True
+    return zinfo
+
+
+def _write_deflated(zip_file, filename, arcname, compresslevel):
+    """
+    Streams ``filename`` into ``zip_file`` as a DEFLATE entry at ``compresslevel``.  zipfile only ever uses the
+    default level, so this follows ZipFile.write but with our own compressor.
+    """
+    zinfo = _zipinfo(zip_file, arcname, os.stat(filename))
+
+    # Sizes and CRC are only known at the end, the header is rewritten once they are
+    zip64 = zinfo.file_size * 1.05 > zipfile.ZIP64_LIMIT
+    zinfo.CRC = crc = 0
+    zinfo.compress_size = compress_size = 0
+    zip_file.fp.write(zinfo.FileHeader(zip64))
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -15)
+    file_size = 0
+    with open(filename, 'rb') as fp:
+        while True:
+            buf = fp.read(CHUNK_SIZE)
+            if not buf:
+                break
+            file_size += len(buf)
+            crc = zlib.crc32(buf, crc) & 0xffffffff
+            buf = compressor.compress(buf)
+            compress_size += len(buf)
+            zip_file.fp.write(buf)
+    buf = compressor.flush()
+    compress_size += len(buf)
+    zip_file.fp.write(buf)
+
+    zinfo.CRC = crc
+    zinfo.file_size = file_size
+    zinfo.compress_size = compress_size
+    position = zip_file.fp.tell()
+    zip_file.fp.seek(zinfo.header_offset, 0)
+    zip_file.fp.write(zinfo.FileHeader(zip64))
+    zip_file.fp.seek(position, 0)
+    zip_file.filelist.append(zinfo)
+    zip_file.NameToInfo[zinfo.filename] = zinfo
+
+
+def _deflate_file(args):
+    """
+    Worker half of a parallel archive: reads and compresses one file in memory.  Module level so that it can be
+    sent to a process pool.
+
+    :return: (stat result, CRC, size, compressed bytes), or None if the file is too large and should be streamed
+        instead
+    """
+    filename, compresslevel = args
+    st = os.stat(filename)
+    if st.st_size > PARALLEL_MAX_FILE_SIZE:
+        return None
+    with open(filename, 'rb') as fp:
+        data = fp.read()
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    return st, zlib.crc32(data) & 0xffffffff, len(data), compressed
+
+
+def _write_compressed(zip_file, arcname, deflated):
+    """
+    Writer half of a parallel archive: appends an entry compressed by _deflate_file
+    """
+    st, crc, file_size, compressed = deflated
+    zinfo = _zipinfo(zip_file, arcname, st)
+    zinfo.CRC = crc
+    zinfo.file_size = file_size
+    zinfo.compress_size = len(compressed)
+    zip_file.fp.write(zinfo.FileHeader(False))
+    zip_file.fp.write(compressed)
+    zip_file.filelist.append(zinfo)
+    zip_file.NameToInfo[zinfo.filename] = zinfo
+
+
+def create_bits_zip(path, compression=zipfile.ZIP_DEFLATED, compresslevel=DEFAULT_COMPRESSLEVEL,
+                    spill_threshold=DEFAULT_SPILL_THRESHOLD, exclude=None, workers=1, use_processes=False):
+    """
+    Packages the application at ``path`` into a zip archive.  The archive is built in memory until it grows past
+    ``spill_threshold`` bytes, after which it continues in a temporary file, so large apps don't need their whole
+    archive in RAM.  With ``workers`` above 1, files are compressed on a pool while the archive is assembled in
+    path order, so the result is byte-identical to the serial one.
+
+    :param path: The local path containing the bits
+    :type path: str
+    :param compression: zipfile.ZIP_DEFLATED or zipfile.ZIP_STORED
+    :type compression: int
+    :param compresslevel: DEFLATE level, 1 (fastest) to 9 (smallest)
+    :type compresslevel: int
+    :param spill_threshold: Size in bytes above which the archive moves from memory to a temporary file
+    :type spill_threshold: int
+    :param exclude: Relative paths to leave out, e.g. files the blobstore already holds
+    :type exclude: set
+    :param workers: Number of files compressed in parallel (DEFLATE only)
+    :type workers: int
+    :param use_processes: Compress on a process pool rather than a thread pool
+    :type use_processes: bool
+    :return: The archive, rewound to its start.  Close it once done to release the temporary file.
+    :rtype: tempfile.SpooledTemporaryFile
+    """
+    buffer = tempfile.SpooledTemporaryFile(max_size=spill_threshold)
+    zip_file = zipfile.ZipFile(buffer, 'w', compression, allowZip64=True)
+    files = [(filename, relpath) for filename, relpath in iter_bits(path) if not exclude or relpath not in exclude]
+    if compression == zipfile.ZIP_DEFLATED and workers > 1 and len(files) > 1:
+        workers = min(workers, len(files))
+        pool = (Pool if use_processes else ThreadPool)(workers)
+        try:
+            # Only a bounded window of files is compressed ahead of the writer, so that compressed entries don't
+            # pile up in memory while it streams a large file or spills to disk.  Results are taken in submission
+            # order, so entries land in path order.
+            pending = deque()
+            queued = iter(files)
+            for filename, relpath in itertools.islice(queued, workers * PARALLEL_WINDOW_PER_WORKER):
+                pending.append((filename, relpath, pool.apply_async(_deflate_file, ((filename, compresslevel),))))
+            while pending:
+                filename, relpath, result = pending.popleft()
+                entry = result.get()
+                for next_filename, next_relpath in itertools.islice(queued, 1):
+                    pending.append((next_filename, next_relpath,
+                                    pool.apply_async(_deflate_file, ((next_filename, compresslevel),))))
+                if entry is None:
+                    _write_deflated(zip_file, filename, relpath, compresslevel)
+                else:
+                    _write_compressed(zip_file, relpath, entry)
+        finally:
+            pool.terminate()
+    else:
+        for filename, relpath in files:
+            if compression == zipfile.ZIP_DEFLATED:
+                _write_deflated(zip_file, filename, relpath, compresslevel)
+            else:
+                zip_file.write(filename,arcname=relpath)
+    zip_file.close()
+    buffer.seek(0)
+    return buffer
+
+
+class MultipartBody(object):
+    """
+    A multipart/form-data request body that is read in chunks, streaming file parts straight from their file
+    objects instead of building the whole body in memory.  Pass it as ``data`` along with its ``content_type``.
+    """
+
+    def __init__(self, fields, boundary=None):
+        """
+        :param fields: (name, value) pairs for plain fields, or (name, fileobj, filename, content_type) tuples for
+            files.  File objects must be seekable; they are read from their current position to the end.
+        :type fields: list
+        :param boundary: The part boundary, random by default
+        :type boundary: str
+        """
+        self.boundary = boundary or uuid.uuid4().hex
+        self._parts = []
+        for field in fields:
+            if len(field) == 2:
+                name, value = field
+                if isinstance(value, unicode):
+                    value = value.encode('utf-8')
+                self._parts.append(self._part_header(name) + value + '\r\n')
+            else:
+                name, fileobj, filename, content_type = field
+                self._parts.append(self._part_header(name, filename, content_type))
+                self._parts.append(fileobj)
+                self._parts.append('\r\n')
+        self._parts.append('--{}--\r\n'.format(self.boundary))
+        self._length = sum(self._part_length(part) for part in self._parts)
+        self._current = 0
+
+    def _part_header(self, name, filename=None, content_type=None):
+        disposition = 'form-data; name="{}"'.format(name)
+        if filename is not None:
+            disposition += '; filename="{}"'.format(filename)
+        header = '--{}\r\nContent-Disposition: {}\r\n'.format(self.boundary, disposition)
+        if content_type is not None:
+            header += 'Content-Type: {}\r\n'.format(content_type)
+        return header + '\r\n'
+
+    @staticmethod
+    def _part_length(part):
+        if isinstance(part, str):
+            return len(part)
+        position = part.tell()
+        part.seek(0, os.SEEK_END)
+        length = part.tell() - position
+        part.seek(position)
+        return length
+
+    @property
+    def content_type(self):
+        return 'multipart/form-data; boundary={}'.format(self.boundary)
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length
+        chunks = []
+        while size > 0 and self._current < len(self._parts):
+            part = self._parts[self._current]
+            if isinstance(part, str):
+                chunk, self._parts[self._current] = part[:size], part[size:]
+                if not self._parts[self._current]:
+                    self._current += 1
+            else:
+                chunk = part.read(min(size, CHUNK_SIZE))
+                if not chunk:
+                    self._current += 1
+                    continue
+            chunks.append(chunk)
+            size -= len(chunk)
+        return ''.join(chunks)
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
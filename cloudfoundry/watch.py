@@ -0,0 +1,123 @@
+import logging
+import threading
+from cloudfoundry.indexes import field_value
+from cloudfoundry.polling import Poller
+from cloudfoundry.sync import resource_timestamp
+
+
+WATCH_EVENTS = ('added', 'changed', 'removed')
+DEFAULT_WATCH_INTERVAL = 10
+
+# Field matched by the ``name`` filter of a watch, per resource type
+NAME_FIELDS = {'routes': 'host'}
+
+
+class Watch(object):
+    """
+    One subscription: ``callback(event, obj)`` is called for each matching change, where ``event`` is one of
+    WATCH_EVENTS and ``obj`` the model object (as last seen, for removals)
+    """
+
+    def __init__(self, watcher, kind, callback, events=WATCH_EVENTS, space_guid=None, name=None):
+        self.kind = kind
+        self.callback = callback
+        self.events = frozenset(events)
+        self.space_guid = space_guid
+        self.name = name
+        self._watcher = watcher
+
+    def matches(self, event, resource):
+        if event not in self.events:
+            return False
+        if self.space_guid is not None:
+            field = 'guid' if self.kind == 'spaces' else 'space_guid'
+            if field_value(resource, field) != self.space_guid:
+                return False
+        if self.name is not None and field_value(resource, NAME_FIELDS.get(self.kind, 'name')) != self.name:
+            return False
+        return True
+
+    def cancel(self):
+        self._watcher.remove(self)
+
+
+class Watcher(object):
+    """
+    Detects changes to an interface's collections for all of its watches at once.  Each poll refreshes every watched
+    collection through the interface (so through its cache, and incrementally when enabled), diffs it against the
+    previous poll by guid and ``updated_at``, and hands the changes to the matching watches.  Polling runs on a
+    thread of the watcher's own while there are watches, and so do the callbacks: a slow listing or callback delays
+    the next poll but never the waits on the shared poller (``wait_for_job``, ``wait_for_app``...).
+    """
+
+    def __init__(self, interface, interval=DEFAULT_WATCH_INTERVAL):
+        self.interface = interface
+        self.interval = interval
+        self._watches = []
+        self._seen = {}
+        self._handle = None
+        self._poller = Poller(name="cloudfoundry-watch")
+        self._lock = threading.Lock()
+
+    def add(self, watch):
+        with self._lock:
+            self._watches.append(watch)
+            if self._handle is None or self._handle.done():
+                self._handle = self._poller.submit(self._check, "changes to {}".format(self.interface._target),
+                                                   interval=self.interval, max_interval=self.interval,
+                                                   backoff=1, timeout=None, delay=0)
+
+    def remove(self, watch):
+        with self._lock:
+            if watch in self._watches:
+                self._watches.remove(watch)
+            if not any(other.kind == watch.kind for other in self._watches):
+                self._seen.pop(watch.kind, None)
+
+    def _check(self):
+        with self._lock:
+            watches = list(self._watches)
+            if not watches:
+                self._handle = None
+                return True, None
+        for kind in set(watch.kind for watch in watches):
+            try:
+                self._poll(kind, [watch for watch in watches if watch.kind == kind])
+            except Exception as e:
+                logging.warn("Watching {} failed: {}".format(kind, e))
+        return False, None
+
+    def _poll(self, kind, watches):
+        collection = getattr(self.interface, kind)
+        current = {}
+        for guid, resource in collection.records():
+            current[guid] = (resource_timestamp(resource) if resource is not None else None, resource)
+        previous = self._seen.get(kind)
+        self._seen[kind] = current
+        if previous is None:
+            # First poll: a baseline, not a burst of 'added' events
+            return
+        changes = []
+        for guid, (timestamp, resource) in current.items():
+            if guid not in previous:
+                changes.append(('added', guid, resource))
+            elif timestamp != previous[guid][0]:
+                changes.append(('changed', guid, resource))
+        for guid, (timestamp, resource) in previous.items():
+            if guid not in current:
+                changes.append(('removed', guid, resource))
+        if changes:
+            logging.debug("{} changes to {}".format(len(changes), kind))
+        for event, guid, resource in changes:
+            obj = None
+            for watch in watches:
+                if resource is not None and watch.matches(event, resource):
+                    if obj is None:
+                        # The resource may have been dropped since the poll, so fall back to a model of the record
+                        obj = collection.get(guid) if event != 'removed' else None
+                        if obj is None:
+                            obj = self.interface._model(kind, resource)
+                    try:
+                        watch.callback(event, obj)
+                    except Exception as e:
+                        logging.warn("Watch callback for {} {} failed: {}".format(event, guid, e))
@@ -0,0 +1,156 @@
+"""
+An in-memory stand-in for the Cloud Controller and UAA, plugged into CloudFoundryInterface as its transport.  It
+answers with real ``requests.Response`` objects, so everything above the transport runs as it would against an API.
+"""
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from urlparse import urlparse, parse_qsl
+
+import requests
+
+
+TARGET = 'https://api.example.com'
+UAA = 'https://uaa.example.com'
+
+LISTINGS = {
+    'apps': 'apps',
+    'spaces': 'spaces',
+    'organizations': 'orgs',
+    'routes': 'routes',
+    'shared_domains': 'domains',
+    'private_domains': 'private_domains',
+    'stacks': 'stacks',
+    'events': 'events',
+}
+
+
+def make_response(status, body=None, headers=None, url=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(body) if body is not None else ''
+    response.headers.update(headers or {})
+    response.headers.setdefault('Content-Type', 'application/json')
+    response.url = url
+    response.encoding = 'utf-8'
+    return response
+
+
+def timestamp():
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+
+def matches(resource, query):
+    for operator in ('>=', ' IN ', ':'):
+        if operator in query:
+            field, value = query.split(operator, 1)
+            break
+    else:
+        return True
+    if field in ('created_at', 'updated_at', 'timestamp'):
+        actual = resource['metadata'].get(field) or resource['entity'].get(field)
+        return actual is not None and actual >= value
+    actual = resource['metadata']['guid'] if field == 'guid' else resource['entity'].get(field)
+    if operator == ' IN ':
+        return actual in value.split(',')
+    return actual == value
+
+
+class StubTransport(object):
+    """
+    Serves v2 listings (paginated and filtered with ``q``), single resources, creates, updates, deletes, ``v2/info``
+    and password or refresh token grants.  With ``etags`` set, GET responses carry an ETag and matching conditional requests get a
+    304.  Every call is recorded in ``calls`` as (method, url, headers, other keyword arguments).
+    """
+
+    def __init__(self, etags=False, delay=0, expires_in=600, password='secret'):
+        self.timeout = (10, 120)
+        self.upload_timeout = (10, None)
+        self.pool_maxsize = 32
+        self.etags = etags
+        self.delay = delay
+        self.expires_in = expires_in
+        self.password = password
+        self.resources = dict((kind, OrderedDict()) for kind in set(LISTINGS.values()))
+        self.calls = []
+        self.grants = []
+        self._lock = threading.Lock()
+
+    def add(self, kind, **entity):
+        guid = str(uuid.uuid4())
+        resource = {'metadata': {'guid': guid, 'url': '/v2/{}/{}'.format(kind, guid), 'created_at': timestamp(),
+                                 'updated_at': None},
+                    'entity': entity}
+        with self._lock:
+            self.resources[kind][guid] = resource
+        return resource
+
+    def remove(self, kind, guid):
+        with self._lock:
+            self.resources[kind].pop(guid, None)
+
+    def requests_to(self, path):
+        return [call for call in self.calls if urlparse(call[1]).path == path]
+
+    def request(self, method, url, headers=None, data=None, files=None, **kwargs):
+        parts = urlparse(url)
+        with self._lock:
+            self.calls.append((method, url, dict(headers or {}), kwargs))
+        if self.delay:
+            time.sleep(self.delay)
+        if parts.path == '/v2/info':
+            return make_response(200, {'authorization_endpoint': UAA}, url=url)
+        if parts.path == '/oauth/token':
+            return self._grant(data, url)
+        response = self._api(method, parts, url, data)
+        if self.etags and method == 'GET' and response.status_code == 200:
+            tag = '"{}"'.format(hashlib.md5(response.content).hexdigest())
+            response.headers['ETag'] = tag
+            if (headers or {}).get('If-None-Match') == tag:
+                return make_response(304, headers={'ETag': tag}, url=url)
+        return response
+
+    def _grant(self, data, url):
+        self.grants.append(data['grant_type'])
+        if data['grant_type'] == 'password' and data['password'] != self.password:
+            return make_response(401, {'error': 'unauthorized'}, url=url)
+        return make_response(200, {'access_token': 'token-{}'.format(len(self.grants)), 'refresh_token': 'refresh',
+                                   'expires_in': self.expires_in}, url=url)
+
+    def _api(self, method, parts, url, data=None):
+        segments = [segment for segment in parts.path.split('/') if segment]
+        kind = LISTINGS.get(segments[1]) if len(segments) > 1 else None
+        if kind is None:
+            return make_response(404, {'description': 'Unknown request'}, url=url)
+        with self._lock:
+            records = list(self.resources[kind].values())
+        if len(segments) == 2 and method == 'POST':
+            return make_response(201, self.add(kind, **json.loads(data)), url=url)
+        if len(segments) == 2 and method == 'GET':
+            params = parse_qsl(parts.query)
+            for name, value in params:
+                if name == 'q':
+                    records = [record for record in records if matches(record, value)]
+            params = dict(params)
+            per_page = int(params.get('results-per-page', 50))
+            page = int(params.get('page', 1))
+            total_pages = max(1, (len(records) + per_page - 1) // per_page)
+            return make_response(200, {'total_results': len(records), 'total_pages': total_pages,
+                                       'prev_url': None, 'next_url': None,
+                                       'resources': records[(page - 1) * per_page:page * per_page]}, url=url)
+        resource = self.resources[kind].get(segments[2])
+        if resource is None:
+            return make_response(404, {'description': 'The resource could not be found'}, url=url)
+        if method == 'DELETE':
+            self.remove(kind, segments[2])
+            return make_response(204, url=url)
+        if method == 'PUT' and len(segments) == 3:
+            with self._lock:
+                resource = {'metadata': dict(resource['metadata'], updated_at=timestamp()),
+                            'entity': dict(resource['entity'], **json.loads(data))}
+                self.resources[kind][segments[2]] = resource
+            return make_response(201, resource, url=url)
+        return make_response(200, resource, url=url)
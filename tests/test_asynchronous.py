@@ -0,0 +1,73 @@
+import threading
+import unittest
+
+from cloudfoundry import CloudFoundryInterface
+from cloudfoundry.asynchronous import AsyncCloudFoundryInterface, pool_size
+from cloudfoundry.auth import TokenCache
+from cloudfoundry.paging import DEFAULT_MAX_WORKERS
+
+from stub import StubTransport, TARGET
+
+
+class AsyncCloudFoundryInterfaceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = StubTransport()
+        for number in range(120):
+            self.transport.add('apps', name='app-{}'.format(number), space_guid='space-1')
+        self.cfi = AsyncCloudFoundryInterface(TARGET, concurrency=4, username='user', password='secret',
+                                              transport=self.transport, token_cache=TokenCache())
+
+    def tearDown(self):
+        self.cfi.close()
+
+    def test_calls_run_on_the_pool(self):
+        self.assertTrue(self.cfi.login().get(timeout=10))
+        apps = self.cfi.apps().get(timeout=10)
+        self.assertEqual(len(apps), 120)
+        found = [self.cfi.get_app_by_name('app-{}'.format(number)) for number in range(10)]
+        self.assertEqual([result.get(timeout=10).name for result in found],
+                         ['app-{}'.format(number) for number in range(10)])
+
+    def test_callback(self):
+        self.cfi.login().get(timeout=10)
+        done = threading.Event()
+        received = []
+
+        def callback(apps):
+            received.append(len(apps))
+            done.set()
+
+        self.cfi.apps(callback=callback)
+        self.assertTrue(done.wait(10))
+        self.assertEqual(received, [120])
+
+    def test_errors_are_raised_by_get(self):
+        cfi = AsyncCloudFoundryInterface(TARGET, username='user', password='wrong', transport=StubTransport(),
+                                         token_cache=TokenCache())
+        try:
+            self.assertRaises(Exception, cfi.login().get, 10)
+        finally:
+            cfi.close()
+
+    def test_pool_sized_for_concurrency(self):
+        cfi = AsyncCloudFoundryInterface(TARGET, concurrency=20, username='user', password='secret')
+        try:
+            self.assertEqual(cfi.interface._transport.pool_maxsize, 20 + DEFAULT_MAX_WORKERS)
+        finally:
+            cfi.close()
+        self.assertEqual(pool_size(20, max_workers=4), 24)
+
+    def test_wraps_an_existing_interface(self):
+        interface = CloudFoundryInterface(TARGET, username='user', password='secret', transport=self.transport,
+                                          token_cache=TokenCache())
+        cfi = AsyncCloudFoundryInterface(TARGET, interface=interface)
+        try:
+            cfi.login().get(timeout=10)
+            self.assertTrue(interface.live)
+        finally:
+            cfi.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
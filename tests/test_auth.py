@@ -0,0 +1,55 @@
+import time
+import unittest
+
+from cloudfoundry import CloudFoundryInterface
+from cloudfoundry.auth import Token, TokenCache, redact
+from cloudfoundry.exceptions import CloudFoundryAuthenticationException
+
+from stub import StubTransport, TARGET
+
+
+class TokenCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = StubTransport()
+        self.tokens = TokenCache()
+
+    def interface(self, password='secret'):
+        return CloudFoundryInterface(TARGET, username='user', password=password, transport=self.transport,
+                                     token_cache=self.tokens)
+
+    def test_same_credentials_share_a_login(self):
+        first = self.interface().login()
+        second = self.interface().login()
+        self.assertEqual(first, second)
+        self.assertEqual(self.transport.grants, ['password'])
+
+    def test_wrong_password_is_not_given_the_cached_token(self):
+        self.interface().login()
+        self.assertRaises(CloudFoundryAuthenticationException, self.interface('WRONG').login)
+        self.assertEqual(self.transport.grants, ['password', 'password'])
+
+    def test_cache_keeps_no_password(self):
+        self.interface().login()
+        self.assertNotIn('secret', repr(self.tokens._tokens))
+
+    def test_lookup_requires_the_password(self):
+        token = Token('access', 'refresh', time.time() + 600)
+        self.tokens.set(TARGET, 'user', token, u'p\xe4ss')
+        self.assertEqual(self.tokens.get(TARGET, 'user', u'p\xe4ss'), token)
+        self.assertIsNone(self.tokens.get(TARGET, 'user', 'other'))
+        self.assertIsNone(self.tokens.get(TARGET, 'user'))
+
+    def test_expiring_token_is_refreshed(self):
+        self.transport.expires_in = 30
+        cfi = self.interface()
+        cfi.login()
+        cfi.apps
+        self.assertEqual(self.transport.grants[:2], ['password', 'refresh_token'])
+
+    def test_redact(self):
+        self.assertEqual(redact('{"access_token": "abc.def"}'), '{"access_token": "<redacted>"}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import zipfile
+
+from cloudfoundry import utils
+
+
+class BitsZipTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for number in range(200):
+            subdirectory = os.path.join(self.directory, 'dir-{}'.format(number % 7))
+            if not os.path.isdir(subdirectory):
+                os.mkdir(subdirectory)
+            with open(os.path.join(subdirectory, 'file-{}'.format(number)), 'wb') as fp:
+                fp.write(os.urandom(512) + 'x' * (number * 50))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def archive(self, **kwargs):
+        bits = utils.create_bits_zip(self.directory, **kwargs)
+        try:
+            return bits.read()
+        finally:
+            bits.close()
+
+    def test_parallel_archive_matches_serial(self):
+        serial = self.archive()
+        self.assertEqual(self.archive(workers=4), serial)
+        self.assertEqual(self.archive(workers=4, spill_threshold=1024), serial)
+        self.assertEqual(len(zipfile.ZipFile(utils.create_bits_zip(self.directory, workers=3)).filelist), 200)
+
+    def test_workers_stay_within_a_window_of_the_writer(self):
+        lock = threading.Lock()
+        counts = {'compressed': 0, 'written': 0, 'ahead': 0}
+        deflate_file, write_compressed = utils._deflate_file, utils._write_compressed
+
+        def counting_deflate(args):
+            result = deflate_file(args)
+            with lock:
+                counts['compressed'] += 1
+                counts['ahead'] = max(counts['ahead'], counts['compressed'] - counts['written'])
+            return result
+
+        def counting_write(zip_file, arcname, deflated):
+            write_compressed(zip_file, arcname, deflated)
+            with lock:
+                counts['written'] += 1
+
+        utils._deflate_file, utils._write_compressed = counting_deflate, counting_write
+        try:
+            self.archive(workers=2)
+        finally:
+            utils._deflate_file, utils._write_compressed = deflate_file, write_compressed
+        self.assertEqual(counts['written'], 200)
+        self.assertLessEqual(counts['ahead'], 2 * utils.PARALLEL_WINDOW_PER_WORKER + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from cloudfoundry import CloudFoundryInterface
+from cloudfoundry.auth import TokenCache
+from cloudfoundry.bulk import run_bulk
+from cloudfoundry.exceptions import CloudFoundryException
+
+from stub import StubTransport, TARGET
+
+
+class RunBulkTest(unittest.TestCase):
+
+    def test_every_error_stays_with_its_item(self):
+        def func(number):
+            if number == 1:
+                raise CloudFoundryException("failed")
+            if number == 2:
+                raise ValueError("No JSON object could be decoded")
+            assert number != 3
+            return number * 10
+
+        results = run_bulk(func, [(number,) for number in range(5)], concurrency=2)
+        self.assertEqual([result.item for result in results], [(number,) for number in range(5)])
+        self.assertEqual([result.result for result in results], [0, None, None, None, 40])
+        self.assertEqual([type(result.error) for result in results],
+                         [type(None), CloudFoundryException, ValueError, AssertionError, type(None)])
+
+    def test_empty(self):
+        self.assertEqual(run_bulk(lambda: None, []), [])
+
+
+class BulkUpdateTest(unittest.TestCase):
+
+    def test_bad_item_does_not_discard_the_others(self):
+        transport = StubTransport()
+        for number in range(4):
+            transport.add('apps', name='app-{}'.format(number))
+        cfi = CloudFoundryInterface(TARGET, username='user', password='secret', transport=transport,
+                                    token_cache=TokenCache())
+        cfi.login()
+        apps = [cfi.apps.first('name', 'app-{}'.format(number)) for number in range(4)]
+        items = [(app, {'instances': 2}) for app in apps]
+        items[1] = (apps[1], 'instances=2')
+        results = cfi.bulk_update_apps(items)
+        self.assertIsInstance(results[1].error, AssertionError)
+        self.assertEqual([result.result.instances for result in results if result.error is None], [2, 2, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from cloudfoundry.utils import FingerprintCache
+
+
+class FingerprintCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'fingerprints.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content, mtime):
+        filename = os.path.join(self.directory, name)
+        with open(filename, 'w') as fp:
+            fp.write(content)
+        os.utime(filename, (mtime, mtime))
+        return filename
+
+    def saved(self):
+        with open(self.path) as fp:
+            return json.load(fp)
+
+    def test_changed_files_replace_their_entry(self):
+        filename = self.write('a.txt', 'one', 1000)
+        cache = FingerprintCache(self.path)
+        first = cache.sha1(filename)
+        self.write('a.txt', 'two', 2000)
+        second = cache.sha1(filename)
+        self.assertNotEqual(first, second)
+        cache.save()
+        self.assertEqual(self.saved().values(), [second])
+
+    def test_entries_survive_a_reload(self):
+        filename = self.write('a.txt', 'one', 1000)
+        cache = FingerprintCache(self.path)
+        digest = cache.sha1(filename)
+        cache.save()
+        reloaded = FingerprintCache(self.path)
+        self.write('a.txt', 'two', 2000)
+        reloaded.sha1(filename)
+        reloaded.save()
+        self.assertEqual(len(self.saved()), 1)
+        self.assertNotIn(digest, self.saved().values())
+
+    def test_deleted_files_are_dropped_on_save(self):
+        kept = self.write('kept.txt', 'kept', 1000)
+        removed = self.write('removed.txt', 'removed', 1000)
+        cache = FingerprintCache(self.path)
+        cache.sha1_many([(kept, os.stat(kept)), (removed, os.stat(removed))], workers=2)
+        os.remove(removed)
+        cache.save()
+        self.assertEqual([key.split('|')[0] for key in self.saved()], [os.path.abspath(kept)])
+
+    def test_save_leaves_no_temporary_files(self):
+        cache = FingerprintCache(self.path)
+        cache.sha1(self.write('a.txt', 'one', 1000))
+        cache.save()
+        cache.save()
+        self.assertEqual(sorted(os.listdir(self.directory)), ['a.txt', 'fingerprints.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
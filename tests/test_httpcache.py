@@ -0,0 +1,149 @@
+import unittest
+from StringIO import StringIO
+
+from cloudfoundry import CloudFoundryInterface
+from cloudfoundry.auth import TokenCache
+from cloudfoundry.httpcache import ResponseCache
+from cloudfoundry.metrics import MetricsHook
+
+from stub import StubTransport, TARGET, make_response
+
+
+class Recorder(MetricsHook):
+
+    def __init__(self):
+        self.requests = []
+
+    def on_request(self, event):
+        self.requests.append(event)
+
+
+class ConditionalRequestTest(unittest.TestCase):
+
+    def interface(self, transport, **kwargs):
+        self.recorder = Recorder()
+        cfi = CloudFoundryInterface(TARGET, username='user', password='secret', transport=transport,
+                                    token_cache=TokenCache(), hooks=[self.recorder], **kwargs)
+        cfi.login()
+        return cfi
+
+    def populate(self, transport, count):
+        for number in range(count):
+            transport.add('apps', name='app-{}'.format(number))
+
+    def test_unchanged_listing_is_revalidated(self):
+        transport = StubTransport(etags=True)
+        self.populate(transport, 250)
+        cfi = self.interface(transport)
+        apps = cfi.apps
+        guid = apps.first('name', 'app-3').guid
+        del self.recorder.requests[:]
+        cfi._refresh('apps')
+        self.assertEqual([event.cache_hit for event in self.recorder.requests], [True, True, True])
+        self.assertEqual([event.bytes for event in self.recorder.requests], [0, 0, 0])
+        self.assertIs(cfi.apps.record(guid), apps.record(guid))
+
+    def test_changed_listing_is_rebuilt(self):
+        transport = StubTransport(etags=True)
+        self.populate(transport, 250)
+        cfi = self.interface(transport)
+        transport.add('apps', name='new')
+        cfi._refresh('apps')
+        self.assertEqual(len(cfi.apps), 251)
+        self.assertEqual(cfi.apps.first('name', 'new').name, 'new')
+
+    def test_unchanged_body_without_validators_is_not_decoded_again(self):
+        transport = StubTransport()
+        self.populate(transport, 120)
+        cfi = self.interface(transport)
+        cfi.apps
+        cfi._refresh('apps')
+        self.assertEqual(cfi._responses.reused, 2)
+        self.assertEqual(cfi._responses.revalidated, 0)
+
+    def test_large_listing_stays_cached(self):
+        transport = StubTransport(etags=True)
+        self.populate(transport, 3000)
+        cfi = self.interface(transport, results_per_page=10)
+        cfi.apps
+        cfi._refresh('apps')
+        self.assertEqual(cfi._responses.revalidated, 300)
+        self.assertEqual(cfi._responses.reused, 300)
+
+    def test_changes_to_models_do_not_reach_the_cache(self):
+        transport = StubTransport(etags=True)
+        transport.add('apps', name='app', environment_json={'K': 'v'})
+        cfi = self.interface(transport)
+        app = cfi.apps.first('name', 'app')
+        env = app.environment_json
+        env['K'] = 'x'
+        cfi._refresh('apps')
+        self.assertEqual(cfi._responses.revalidated, 1)
+        self.assertEqual(cfi.apps.first('name', 'app').environment_json, {'K': 'v'})
+        self.assertEqual(cfi.apps.record(app.guid)['entity']['environment_json'], {'K': 'v'})
+
+    def test_not_modified_after_eviction_is_fetched_again(self):
+        transport = StubTransport(etags=True)
+        self.populate(transport, 10)
+        cfi = self.interface(transport)
+        cfi.apps
+        request = transport.request
+
+        def evicting_request(method, url, **kwargs):
+            response = request(method, url, **kwargs)
+            if response.status_code == 304:
+                cfi._responses.clear()
+            return response
+
+        transport.request = evicting_request
+        del self.recorder.requests[:]
+        cfi._refresh('apps')
+        self.assertEqual(len(cfi.apps), 10)
+        self.assertEqual([event.status for event in self.recorder.requests], [200])
+        conditional = [call[2].get('If-None-Match') is not None for call in transport.requests_to('/v2/apps')]
+        self.assertEqual(conditional[-2:], [True, False])
+
+    def test_inventory_bypasses_the_cache(self):
+        transport = StubTransport(etags=True)
+        self.populate(transport, 120)
+        cfi = self.interface(transport)
+        out = StringIO()
+        self.assertEqual(cfi.export_inventory('apps', out, format='jsonl'), 120)
+        self.assertEqual(len(cfi._responses), 0)
+        self.assertFalse(any('If-None-Match' in call[2] for call in transport.calls))
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def response(self, body, etag=None):
+        return make_response(200, body, headers={'ETag': etag} if etag else None)
+
+    def test_decoded_values_count_against_the_budget(self):
+        cache = ResponseCache(max_bytes=1000)
+        for number in range(20):
+            cache.json('https://api.example.com/v2/apps?page={}'.format(number),
+                       self.response({'resources': ['x' * 100]}))
+            self.assertLessEqual(cache.size, 1000)
+        self.assertLess(len(cache), 20)
+        self.assertGreater(len(cache), 0)
+
+    def test_bodies_and_decoded_values_both_count(self):
+        cache = ResponseCache()
+        url = 'https://api.example.com/v2/apps'
+        response = self.response({'name': 'app'}, etag='"1"')
+        cache.store(url, response)
+        cache.json(url, response)
+        self.assertEqual(cache.size, 2 * len(response.content))
+        self.assertEqual(cache.conditional_headers(url), {'If-None-Match': '"1"'})
+
+    def test_disabled(self):
+        cache = ResponseCache(max_bytes=0)
+        url = 'https://api.example.com/v2/apps'
+        response = self.response({'name': 'app'}, etag='"1"')
+        cache.store(url, response)
+        self.assertEqual(cache.json(url, response), {'name': 'app'})
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
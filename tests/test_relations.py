@@ -0,0 +1,48 @@
+import unittest
+
+from cloudfoundry import CloudFoundryInterface
+from cloudfoundry.auth import TokenCache
+
+from stub import StubTransport, TARGET
+
+
+class RelationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = StubTransport()
+        self.spaces = [self.transport.add('spaces', name='space-{}'.format(number)) for number in range(3)]
+        for number in range(9):
+            self.transport.add('apps', name='app-{}'.format(number),
+                               space_guid=self.spaces[number % 3]['metadata']['guid'])
+
+    def interface(self, **kwargs):
+        cfi = CloudFoundryInterface(TARGET, username='user', password='secret', transport=self.transport,
+                                    token_cache=TokenCache(), **kwargs)
+        cfi.login()
+        return cfi
+
+    def test_resolved_from_the_cached_collection(self):
+        cfi = self.interface()
+        cfi.spaces
+        app = cfi.apps.first('name', 'app-1')
+        del self.transport.calls[:]
+        self.assertEqual(app.space.name, 'space-1')
+        self.assertEqual(self.transport.calls, [])
+
+    def test_fetched_when_not_cached(self):
+        cfi = self.interface()
+        app = cfi.apps.first('name', 'app-2')
+        self.assertEqual(app.space.name, 'space-2')
+        self.assertEqual(len(self.transport.requests_to('/v2/spaces/' + app.space_guid)), 1)
+
+    def test_partial_collection_expiring_during_the_fetch(self):
+        cfi = self.interface(cache_ttls={'spaces': 0.02})
+        apps = sorted((cfi.apps[guid] for guid in cfi.apps), key=lambda app: app.name)
+        self.transport.delay = 0.05
+        self.assertEqual(apps[0].space.name, 'space-0')
+        self.assertEqual(len(cfi.prefetch(apps[1:], 'space')), 8)
+        self.assertEqual(len(cfi._prefetch_relation(apps[1:], 'space')), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
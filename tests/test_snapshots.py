@@ -0,0 +1,135 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from cloudfoundry import CloudFoundryInterface
+from cloudfoundry.auth import TokenCache
+from cloudfoundry.snapshot import SnapshotStore
+
+from stub import StubTransport, TARGET
+
+
+# Fetches the apps and exits at once, while the snapshot is still being written
+SHORT_LIVED_SCRIPT = """
+import sys
+import time
+sys.path[:0] = sys.argv[2:]
+from cloudfoundry import CloudFoundryInterface
+from cloudfoundry.auth import TokenCache
+from cloudfoundry.snapshot import SnapshotStore
+from stub import StubTransport, TARGET
+
+
+class SlowStore(SnapshotStore):
+
+    def save(self, *args):
+        time.sleep(0.5)
+        SnapshotStore.save(self, *args)
+
+
+transport = StubTransport()
+for number in range(30):
+    transport.add('apps', name='app-{}'.format(number))
+cfi = CloudFoundryInterface(TARGET, username='user', password='secret', transport=transport,
+                            token_cache=TokenCache(), snapshot_store=SlowStore(sys.argv[1]))
+cfi.login()
+print cfi.cache.namespace
+print len(cfi.apps)
+"""
+
+
+class RecordingStore(SnapshotStore):
+
+    def __init__(self, path):
+        SnapshotStore.__init__(self, path)
+        self.saves = []
+        self.touches = []
+
+    def save(self, namespace, kind, resources, fetched_at, high_water=None, listed_at=None):
+        self.saves.append((kind, threading.current_thread().name))
+        SnapshotStore.save(self, namespace, kind, resources, fetched_at, high_water, listed_at)
+
+    def touch(self, namespace, kind, fetched_at, high_water=None, listed_at=None):
+        self.touches.append(kind)
+        SnapshotStore.touch(self, namespace, kind, fetched_at, high_water, listed_at)
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = RecordingStore(os.path.join(self.directory, 'snapshots.db'))
+        self.transport = StubTransport()
+        for number in range(30):
+            self.transport.add('apps', name='app-{}'.format(number))
+        self.cfi = self.interface()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def interface(self):
+        cfi = CloudFoundryInterface(TARGET, username='user', password='secret', transport=self.transport,
+                                    token_cache=TokenCache(), snapshot_store=self.store, cache_ttl=60)
+        cfi.login()
+        return cfi
+
+    def wait_for_writer(self, cfi):
+        deadline = time.time() + 10
+        while cfi._snapshot_writer and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_saved_off_the_calling_thread(self):
+        self.assertEqual(len(self.cfi.apps), 30)
+        self.wait_for_writer(self.cfi)
+        self.assertEqual([kind for kind, thread in self.store.saves], ['apps'])
+        self.assertNotEqual(self.store.saves[0][1], threading.current_thread().name)
+        self.assertEqual(len(self.store.load(self.cfi.cache.namespace, 'apps').resources), 30)
+
+    def test_unchanged_refresh_only_touches_the_snapshot(self):
+        self.cfi.apps
+        self.wait_for_writer(self.cfi)
+        self.cfi._refresh('apps')
+        self.wait_for_writer(self.cfi)
+        self.assertEqual(len(self.store.saves), 1)
+        self.assertEqual(self.store.touches, ['apps'])
+
+    def test_changed_refresh_rewrites_the_snapshot(self):
+        self.cfi.apps
+        self.wait_for_writer(self.cfi)
+        self.transport.add('apps', name='new')
+        self.cfi._refresh('apps')
+        self.wait_for_writer(self.cfi)
+        self.assertEqual(len(self.store.saves), 2)
+        self.assertEqual(len(self.store.load(self.cfi.cache.namespace, 'apps').resources), 31)
+
+    def test_new_interface_starts_from_the_snapshot(self):
+        self.cfi.apps
+        self.wait_for_writer(self.cfi)
+        del self.transport.calls[:]
+        cfi = self.interface()
+        self.assertEqual(len(cfi.apps), 30)
+        self.assertEqual(self.transport.requests_to('/v2/apps'), [])
+
+    def test_written_before_a_short_lived_process_exits(self):
+        path = os.path.join(self.directory, 'exit.db')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        tests = os.path.dirname(os.path.abspath(__file__))
+        output = subprocess.check_output([sys.executable, '-c', SHORT_LIVED_SCRIPT, path, root, tests])
+        namespace, count = output.splitlines()
+        self.assertEqual(count, '30')
+        self.assertEqual(len(SnapshotStore(path).load(namespace, 'apps').resources), 30)
+
+    def test_local_changes_drop_the_snapshot(self):
+        apps = self.cfi.apps
+        self.wait_for_writer(self.cfi)
+        self.cfi.delete_app(apps.first('name', 'app-1'))
+        self.assertIsNone(self.store.load(self.cfi.cache.namespace, 'apps'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from cloudfoundry import CloudFoundryInterface
+from cloudfoundry.auth import TokenCache
+from cloudfoundry.metrics import MetricsHook
+from cloudfoundry.snapshot import SnapshotStore
+
+from stub import StubTransport, TARGET
+
+
+class Recorder(MetricsHook):
+
+    def __init__(self):
+        self.refreshes = []
+
+    def on_refresh(self, event):
+        self.refreshes.append(event)
+
+
+class IncrementalSyncTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.transport = StubTransport()
+        self.apps = [self.transport.add('apps', name='app-{}'.format(number)) for number in range(5)]
+        self.interfaces = []
+
+    def tearDown(self):
+        for cfi in self.interfaces:
+            self.wait_for_writer(cfi)
+        shutil.rmtree(self.directory)
+
+    def wait_for_writer(self, cfi):
+        deadline = time.time() + 10
+        while cfi._snapshot_writer and time.time() < deadline:
+            time.sleep(0.01)
+
+    def interface(self, **kwargs):
+        self.recorder = Recorder()
+        cfi = CloudFoundryInterface(TARGET, username='user', password='secret', transport=self.transport,
+                                    token_cache=TokenCache(), incremental=True, hooks=[self.recorder], **kwargs)
+        cfi.login()
+        self.interfaces.append(cfi)
+        return cfi
+
+    def test_deletion_without_event_is_dropped_by_the_next_full_listing(self):
+        cfi = self.interface(full_resync_interval=0.5)
+        self.assertEqual(len(cfi.apps), 5)
+        # Deleted along with its space: no delete event for the app itself
+        self.transport.remove('apps', self.apps[0]['metadata']['guid'])
+        cfi._refresh('apps')
+        self.assertEqual(len(cfi.apps), 5)
+        time.sleep(0.5)
+        cfi._refresh('apps')
+        self.assertEqual(len(cfi.apps), 4)
+        self.assertEqual([event.incremental for event in self.recorder.refreshes], [False, True, False])
+
+    def test_last_full_listing_survives_in_the_snapshot(self):
+        path = os.path.join(self.directory, 'snapshots.db')
+        cfi = self.interface(snapshot_store=SnapshotStore(path), full_resync_interval=0.5)
+        cfi.apps
+        self.wait_for_writer(cfi)
+        listed_at = SnapshotStore(path).load(cfi.cache.namespace, 'apps').listed_at
+        self.assertIsNotNone(listed_at)
+
+        cfi = self.interface(snapshot_store=SnapshotStore(path), full_resync_interval=0.5)
+        self.assertEqual(len(cfi.apps), 5)
+        cfi._refresh('apps')
+        time.sleep(0.5)
+        cfi._refresh('apps')
+        self.assertEqual([event.incremental for event in self.recorder.refreshes], [True, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+"""
+Stress tests for one CloudFoundryInterface shared by many threads: readers iterate and look up collections while
+writers update and delete resources, collections expire and are refreshed, snapshots are written and tokens renewed.
+"""
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from cloudfoundry import CloudFoundryInterface
+from cloudfoundry.auth import TokenCache
+from cloudfoundry.exceptions import CloudFoundryNotFoundException
+from cloudfoundry.indexes import APP_INDEXES
+from cloudfoundry.resources import ResourceCollection
+from cloudfoundry.apps import CloudFoundryApp
+from cloudfoundry.snapshot import SnapshotStore
+
+from stub import StubTransport, TARGET
+
+
+DURATION = 2.0
+READERS = 8
+WRITERS = 3
+
+
+def run_threads(targets, duration=DURATION):
+    """
+    Runs each callable in a loop on its own thread for ``duration`` seconds
+
+    :return: The exceptions raised, as strings
+    """
+    errors = []
+    stop = time.time() + duration
+
+    def loop(target):
+        try:
+            while time.time() < stop:
+                target()
+        except Exception as e:
+            errors.append("{}: {!r}".format(threading.current_thread().name, e))
+
+    threads = [threading.Thread(target=loop, args=(target,), name="worker-{}".format(number))
+               for number, target in enumerate(targets)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(duration + 30)
+    return errors
+
+
+def resource(number, space_guid='space-1'):
+    return {'metadata': {'guid': 'guid-{}'.format(number), 'url': '/v2/apps/guid-{}'.format(number)},
+            'entity': {'name': 'app-{}'.format(number), 'space_guid': space_guid}}
+
+
+class ResourceCollectionStressTest(unittest.TestCase):
+
+    def test_concurrent_changes_and_reads(self):
+        collection = ResourceCollection(CloudFoundryApp, APP_INDEXES, [resource(number) for number in range(500)])
+
+        def write():
+            number = random.randrange(1000)
+            if random.random() < 0.5:
+                collection.put(resource(number, random.choice(['space-1', 'space-2'])))
+            elif 'guid-{}'.format(number) in collection:
+                try:
+                    del collection['guid-{}'.format(number)]
+                except KeyError:
+                    # Deleted by another writer in between
+                    pass
+
+        def read():
+            for guid in collection:
+                collection.get(guid)
+            for guid, record in collection.records():
+                self.assertEqual(record['metadata']['guid'], guid)
+            for app in collection.find('space', 'space-2'):
+                self.assertEqual(app.space_guid, 'space-2')
+            collection.first('name', 'app-{}'.format(random.randrange(1000)))
+
+        self.assertEqual(run_threads([write] * WRITERS + [read] * READERS), [])
+        indexed = set(app.guid for space in ('space-1', 'space-2') for app in collection.find('space', space))
+        self.assertEqual(indexed, set(collection))
+
+    def test_copy_is_independent(self):
+        collection = ResourceCollection(CloudFoundryApp, APP_INDEXES, [resource(number) for number in range(10)])
+        copy = collection.copy()
+        del copy['guid-1']
+        copy.put(resource(1, 'space-2'))
+        self.assertEqual(collection.first('name', 'app-1').space_guid, 'space-1')
+        self.assertEqual(copy.first('name', 'app-1').space_guid, 'space-2')
+
+
+class InterfaceStressTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # Tokens always expire within the refresh margin, so requests keep renewing them
+        self.transport = StubTransport(expires_in=60.5)
+        for number in range(300):
+            self.transport.add('apps', name='app-{}'.format(number),
+                               space_guid='space-{}'.format(number % 3))
+        self.cfi = CloudFoundryInterface(TARGET, username='user', password='secret', transport=self.transport,
+                                         token_cache=TokenCache(), cache_ttl=0.05, results_per_page=50,
+                                         snapshot_store=SnapshotStore(os.path.join(self.directory, 'snap.db')),
+                                         watch_interval=0.05)
+        self.cfi.login()
+
+    def tearDown(self):
+        deadline = time.time() + 10
+        while self.cfi._snapshot_writer and time.time() < deadline:
+            time.sleep(0.01)
+        shutil.rmtree(self.directory)
+
+    def test_shared_interface(self):
+        cfi = self.cfi
+        events = []
+        watch = cfi.watch('apps', lambda event, app: events.append(event))
+
+        def read():
+            apps = cfi.apps
+            names = [apps[guid].name for guid in apps if guid in apps]
+            self.assertTrue(names)
+            for app in apps.find('space', 'space-1'):
+                self.assertEqual(app.space_guid, 'space-1')
+            cfi.get_app_by_name('app-{}'.format(random.randrange(300)))
+            self.assertTrue(cfi.live)
+
+        def update():
+            app = cfi.get_app_by_name('app-{}'.format(random.randrange(300)))
+            try:
+                if app is not None:
+                    cfi.update_app(app, {'instances': random.randrange(1, 5)})
+            except CloudFoundryNotFoundException:
+                # Deleted by the other writer in between
+                pass
+
+        def delete():
+            app = cfi.get_app_by_name('app-{}'.format(random.randrange(300)))
+            try:
+                if app is not None:
+                    cfi.delete_app(app)
+            except CloudFoundryNotFoundException:
+                pass
+            time.sleep(0.01)
+
+        def create():
+            self.transport.add('apps', name='new-{}'.format(random.random()), space_guid='space-1')
+            time.sleep(0.01)
+
+        try:
+            errors = run_threads([read] * READERS + [update, delete, create])
+        finally:
+            watch.cancel()
+        self.assertEqual(errors, [])
+
+        # Every request carried a token UAA actually issued
+        used = set(call[2]['Authorization'] for call in list(self.transport.calls)
+                   if call[2].get('Authorization', '').startswith('bearer'))
+        issued = set('bearer token-{}'.format(number) for number in range(1, len(self.transport.grants) + 1))
+        self.assertEqual(used - issued, set())
+        self.assertIn('refresh_token', self.transport.grants)
+
+        # Once the dust settles, a refresh matches the API
+        time.sleep(0.1)
+        self.assertEqual(set(cfi.apps), set(self.transport.resources['apps']))
+        self.assertTrue(events)
+
+
+if __name__ == '__main__':
+    unittest.main()
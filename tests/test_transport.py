@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from cloudfoundry import CloudFoundryInterface
+from cloudfoundry.auth import TokenCache
+from cloudfoundry.transport import Transport
+
+from stub import StubTransport, TARGET
+
+
+class TransportTest(unittest.TestCase):
+
+    def test_grow_closes_the_previous_pool(self):
+        transport = Transport(pool_maxsize=2)
+        adapter = transport.session.get_adapter('https://api.example.com')
+        adapter.poolmanager.connection_from_url('https://api.example.com')
+        self.assertEqual(len(adapter.poolmanager.pools), 1)
+        transport.grow(8)
+        self.assertEqual(len(adapter.poolmanager.pools), 0)
+        grown = transport.session.get_adapter('https://api.example.com')
+        self.assertIsNot(grown, adapter)
+        self.assertIs(transport.session.get_adapter('http://api.example.com'), grown)
+        transport.grow(4)
+        self.assertIs(transport.session.get_adapter('https://api.example.com'), grown)
+
+    def test_uploads_have_no_read_timeout(self):
+        self.assertEqual(Transport(connect_timeout=5, read_timeout=30).upload_timeout, (5, None))
+
+
+class UploadTimeoutTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(os.path.join(self.directory, 'index.html'), 'w') as fp:
+            fp.write('hello')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_bits_upload_waits_for_the_api(self):
+        transport = StubTransport()
+        transport.add('apps', name='app')
+        cfi = CloudFoundryInterface(TARGET, username='user', password='secret', transport=transport,
+                                    token_cache=TokenCache())
+        cfi.login()
+        cfi.upload_bits(cfi.get_app_by_name('app'), self.directory, resource_match=False)
+        timeouts = dict((call[1].split('?')[0].rsplit('/', 1)[-1], call[3].get('timeout'))
+                        for call in transport.calls if '/v2/apps' in call[1])
+        self.assertEqual(timeouts['bits'], (10, None))
+        self.assertEqual(timeouts['apps'], (10, 120))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import time
+import unittest
+from urlparse import urlparse
+
+from cloudfoundry import CloudFoundryInterface
+from cloudfoundry.auth import TokenCache
+
+from stub import StubTransport, TARGET, make_response
+
+
+class ThrottlingTransport(StubTransport):
+    """
+    Answers every request about the throttled guids with a 429 asking to wait a minute
+    """
+
+    def __init__(self, **kwargs):
+        StubTransport.__init__(self, **kwargs)
+        self.throttled = set()
+
+    def request(self, method, url, **kwargs):
+        if any(guid in urlparse(url).path for guid in self.throttled):
+            with self._lock:
+                self.calls.append((method, url, dict(kwargs.get('headers') or {}), kwargs))
+            return make_response(429, {'description': 'Rate limit exceeded'}, headers={'Retry-After': '60'}, url=url)
+        return StubTransport.request(self, method, url, **kwargs)
+
+
+class WaitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = ThrottlingTransport()
+        self.busy = self.transport.add('apps', name='busy', package_state='STAGED')
+        self.quiet = self.transport.add('apps', name='quiet', package_state='STAGED')
+        self.cfi = CloudFoundryInterface(TARGET, username='user', password='secret', transport=self.transport,
+                                         token_cache=TokenCache())
+        self.cfi.login()
+
+    def test_throttled_check_does_not_hold_up_other_waits(self):
+        busy = self.cfi.apps.first('name', 'busy')
+        quiet = self.cfi.apps.first('name', 'quiet')
+        self.transport.throttled.add(busy.guid)
+        started = time.time()
+        busy_handle = self.cfi.wait_for_app(busy, 'STAGED', timeout=30)
+        quiet_handle = self.cfi.wait_for_app(quiet, 'STAGED', timeout=30)
+        try:
+            self.assertEqual(quiet_handle.result(timeout=10).name, 'quiet')
+            self.assertLess(time.time() - started, 10)
+            self.assertFalse(busy_handle.done())
+            # One request per check, never a retry
+            self.assertLessEqual(len(self.transport.requests_to('/v2/apps/' + busy.guid)), busy_handle.polls)
+        finally:
+            busy_handle.cancel()
+
+    def test_throttled_check_is_tried_again(self):
+        busy = self.cfi.apps.first('name', 'busy')
+        self.transport.throttled.add(busy.guid)
+        handle = self.cfi.wait_for_app(busy, 'STAGED', timeout=30)
+        deadline = time.time() + 10
+        while handle.polls < 1 and time.time() < deadline:
+            time.sleep(0.05)
+        self.transport.throttled.clear()
+        self.assertEqual(handle.result(timeout=10).name, 'busy')
+
+
+if __name__ == '__main__':
+    unittest.main()
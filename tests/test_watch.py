@@ -0,0 +1,55 @@
+import threading
+import time
+import unittest
+
+from cloudfoundry import CloudFoundryInterface
+from cloudfoundry.auth import TokenCache
+from cloudfoundry.polling import default_poller
+
+from stub import StubTransport, TARGET
+
+
+class WatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = StubTransport()
+        self.first = self.transport.add('apps', name='first', space_guid='space-1')
+        self.cfi = CloudFoundryInterface(TARGET, username='user', password='secret', transport=self.transport,
+                                         token_cache=TokenCache(), cache_ttl=0, watch_interval=0.05)
+        self.cfi.login()
+        self.events = []
+        self.threads = set()
+        self.changed = threading.Event()
+
+    def callback(self, event, app):
+        self.events.append((event, app.name))
+        self.threads.add(threading.current_thread().name)
+        self.changed.set()
+
+    def test_reports_changes_after_the_baseline(self):
+        watch = self.cfi.watch('apps', self.callback)
+        time.sleep(0.2)
+        self.assertEqual(self.events, [])
+        self.transport.add('apps', name='second', space_guid='space-1')
+        self.assertTrue(self.changed.wait(5))
+        self.changed.clear()
+        self.transport.remove('apps', self.first['metadata']['guid'])
+        self.assertTrue(self.changed.wait(5))
+        watch.cancel()
+        self.assertEqual(self.events, [('added', 'second'), ('removed', 'first')])
+        self.assertEqual(self.threads, set(['cloudfoundry-watch']))
+
+    def test_slow_polls_do_not_hold_up_other_waits(self):
+        self.transport.delay = 0.5
+        watch = self.cfi.watch('apps', self.callback)
+        try:
+            time.sleep(0.1)
+            started = time.time()
+            default_poller().submit(lambda: (True, 'done'), "a quick check", delay=0).result(timeout=5)
+            self.assertLess(time.time() - started, 0.3)
+        finally:
+            watch.cancel()
+
+
+if __name__ == '__main__':
+    unittest.main()